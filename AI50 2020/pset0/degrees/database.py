@@ -0,0 +1,196 @@
+import csv
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+from snapshot import source_key
+
+# Bump whenever the schema below changes, so old databases get re-imported
+VERSION = 1
+
+# Default number of people whose neighbors are kept in memory
+CACHE_SIZE = 100000
+
+# Largest number of ids sent in one query
+BATCH_SIZE = 500
+
+# Counts of a NeighborCache, in the form functools.lru_cache reports them
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+SCHEMA = """
+CREATE TABLE people (id TEXT PRIMARY KEY, name TEXT, name_lower TEXT, birth TEXT);
+CREATE TABLE movies (id TEXT PRIMARY KEY, title TEXT, year TEXT);
+CREATE TABLE stars (person_id TEXT, movie_id TEXT, PRIMARY KEY (person_id, movie_id)) WITHOUT ROWID;
+CREATE INDEX people_by_name ON people (name_lower);
+CREATE INDEX stars_by_movie ON stars (movie_id, person_id);
+CREATE TABLE source (key TEXT);
+"""
+
+
+class Database():
+    """
+    People, movies and stars in an SQLite file, read on demand.
+
+    `people`, `movies` and `names` look like the dictionaries load_data
+    fills, without their sets of movies and stars, and `neighbors` answers
+    neighbors_for_person with a bounded cache of recent people.
+    """
+
+    def __init__(self, path, cache_size=CACHE_SIZE):
+        # Searches may run in server threads, so share one locked connection
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.people = Table(self, "SELECT name, birth FROM people WHERE id = ?", ("name", "birth"), "people")
+        self.movies = Table(self, "SELECT title, year FROM movies WHERE id = ?", ("title", "year"), "movies")
+        self.names = Names(self)
+        self.neighbors = NeighborCache(self, cache_size)
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+
+def open_database(directory, path, cache_size=CACHE_SIZE):
+    """
+    Returns a Database at `path`, importing the directory's CSV files
+    into it first if it is missing or was made from different files.
+    """
+    key = repr((VERSION, source_key(directory)))
+    connection = sqlite3.connect(path)
+    try:
+        stored = connection.execute("SELECT key FROM source").fetchone()
+    except sqlite3.OperationalError:
+        stored = None
+    if stored is None or stored[0] != key:
+        import_csv(connection, directory, key)
+    connection.close()
+    return Database(path, cache_size)
+
+
+def import_csv(connection, directory, key):
+    """
+    Replaces the database contents with the directory's CSV files.
+    Stars rows naming an unknown person or movie are skipped.
+    """
+    connection.execute("PRAGMA synchronous = OFF")
+    for table in ("people", "movies", "stars", "source", "raw_stars"):
+        connection.execute(f"DROP TABLE IF EXISTS {table}")
+    connection.executescript(SCHEMA)
+
+    with connection:
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            connection.executemany(
+                "INSERT OR REPLACE INTO people VALUES (?, ?, ?, ?)",
+                ((row["id"], row["name"], row["name"].lower(), row["birth"]) for row in csv.DictReader(f))
+            )
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            connection.executemany(
+                "INSERT OR REPLACE INTO movies VALUES (?, ?, ?)",
+                ((row["id"], row["title"], row["year"]) for row in csv.DictReader(f))
+            )
+        connection.execute("CREATE TEMPORARY TABLE raw_stars (person_id TEXT, movie_id TEXT)")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            connection.executemany(
+                "INSERT INTO raw_stars VALUES (?, ?)",
+                ((row["person_id"], row["movie_id"]) for row in csv.DictReader(f))
+            )
+        connection.execute("""
+            INSERT OR IGNORE INTO stars
+            SELECT person_id, movie_id FROM raw_stars
+            WHERE person_id IN (SELECT id FROM people) AND movie_id IN (SELECT id FROM movies)
+        """)
+        connection.execute("DROP TABLE raw_stars")
+        connection.execute("INSERT INTO source VALUES (?)", (key,))
+
+
+class Table(Mapping):
+    """
+    Read-only mapping of ids to dictionaries of a table's columns.
+    """
+
+    def __init__(self, database, sql, columns, table):
+        self.database = database
+        self.sql = sql
+        self.columns = columns
+        self.table = table
+
+    def __getitem__(self, key):
+        rows = self.database.query(self.sql, (key,))
+        if not rows:
+            raise KeyError(key)
+        return dict(zip(self.columns, rows[0]))
+
+    def __iter__(self):
+        return (row[0] for row in self.database.query(f"SELECT id FROM {self.table}"))
+
+    def __len__(self):
+        return self.database.query(f"SELECT COUNT(*) FROM {self.table}")[0][0]
+
+
+class Names():
+    """
+    Looks up lowercase names like the names dictionary does.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def get(self, name, default=None):
+        rows = self.database.query("SELECT id FROM people WHERE name_lower = ?", (name,))
+        return {row[0] for row in rows} if rows else default
+
+
+class NeighborCache():
+    """
+    Callable returning (movie_id, person_id) pairs for people who starred
+    with a person, keeping the answers for the most recent people.
+    """
+
+    def __init__(self, database, size):
+        self.database = database
+        self.size = size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, person_id):
+        with self.lock:
+            if person_id in self.cache:
+                self.cache.move_to_end(person_id)
+                self.hits += 1
+                return self.cache[person_id]
+        return self.prefetch([person_id]).get(person_id) or self.cache.get(person_id, ())
+
+    def prefetch(self, person_ids):
+        """
+        Loads the neighbors of uncached people in `person_ids` with one
+        indexed query per BATCH_SIZE people, and returns what was loaded.
+        No more people than the cache holds are loaded at once.
+        """
+        with self.lock:
+            missing = list(dict.fromkeys(p for p in person_ids if p not in self.cache))[:self.size]
+            self.misses += len(missing)
+
+        loaded = {}
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            found = {person_id: [] for person_id in batch}
+            rows = self.database.query(f"""
+                SELECT own.person_id, other.movie_id, other.person_id
+                FROM stars AS own JOIN stars AS other ON own.movie_id = other.movie_id
+                WHERE own.person_id IN ({", ".join("?" * len(batch))})
+            """, batch)
+            for person_id, movie_id, neighbor_id in rows:
+                found[person_id].append((movie_id, neighbor_id))
+
+            with self.lock:
+                for person_id, neighbors in found.items():
+                    loaded[person_id] = self.cache[person_id] = tuple(neighbors)
+                while len(self.cache) > self.size:
+                    self.cache.popitem(last=False)
+        return loaded
+
+    def cache_info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.size, len(self.cache))
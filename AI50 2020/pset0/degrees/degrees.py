@@ -1,6 +1,20 @@
+import argparse
 import csv
+import database
+import functools
+import ingest
+import itertools
+import json
+import resource
+import server
+import snapshot
 import sys
-from util import Node, StackFrontier, QueueFrontier
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from graph import Graph
+from landmarks import DistanceIndex
+from util import Node, StackFrontier, QueueFrontier, PriorityFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -11,55 +25,320 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer graph of who starred in what, used instead of the
+# movies and stars sets when data is loaded with compact=True
+graph = None
 
-def load_data(directory):
+# SQLite database that names, people and movies read from
+# instead, after load_database
+source_database = None
+
+# Connected components and landmark distances of the graph,
+# loaded or built with build_index=True
+distance_index = None
+
+# Number of states explored by the last search
+search_stats = {"explored": 0}
+
+# Number of CSV rows parsed by load_data
+load_stats = {"rows": 0}
+
+
+def load_data(directory, compact=False, use_snapshot=True, build_index=False, jobs=1, progress=None):
     """
     Load data from CSV files into memory.
+
+    With compact=True, people and movies keep only their details and
+    who starred in what is stored in the integer-indexed `graph` instead.
+
+    Unless use_snapshot is False, the data is read from a binary snapshot
+    of the CSV files when one is up to date, and a new snapshot is
+    written after parsing them otherwise.
+
+    With build_index=True, which implies compact, a DistanceIndex of the
+    graph is also loaded from the snapshot, or built and saved with it.
+
+    The CSV files are parsed in chunks, each of which also builds its part
+    of the name index and of the stars sets to be merged here. With jobs > 1
+    the chunks are parsed by that many processes; progress is passed on to
+    ingest.read_csv.
+    """
+    global distance_index
+    compact = compact or build_index
+
+    if use_snapshot and load_snapshot(directory, compact):
+        if build_index and distance_index is None:
+            distance_index = DistanceIndex.build(graph)
+            save_snapshot(directory, graph)
+        return
+
+    # Parse the CSV files in worker processes when asked to
+    pool = ProcessPoolExecutor(jobs) if jobs > 1 else None
+    read = functools.partial(read_chunks, directory, pool=pool, jobs=jobs, progress=progress)
+    try:
+        load_csv(read, compact)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if build_index:
+        distance_index = DistanceIndex.build(graph)
+    if use_snapshot:
+        save_snapshot(directory, graph if compact else graph_from_sets())
+
+
+def load_database(directory, path, cache_size=database.CACHE_SIZE):
+    """
+    Serve names, people and movies from an SQLite database at `path`,
+    importing the CSV files into it if needed. Only the neighbors of
+    up to cache_size recently searched people are kept in memory.
+    """
+    global names, people, movies, source_database
+    source_database = database.open_database(directory, path, cache_size)
+    names = source_database.names
+    people = source_database.people
+    movies = source_database.movies
+
+
+def load_csv(read, compact):
+    """
+    Fills names, people and movies, or the graph if compact is True,
+    from the chunks returned by read(filename, fields, build), each the
+    result of one of ingest's build functions over part of the file.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
+    global graph
+
+    # Load people, merging each chunk's part of the name index
+    for rows, index in read("people.csv", ("id", "name", "birth"), ingest.index_names):
+        for person_id, name, birth in rows:
+            people[person_id] = {
+                "name": name,
+                "birth": birth
             }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
+            if not compact:
+                people[person_id]["movies"] = set()
+        for name, person_ids in index.items():
+            if name not in names:
+                names[name] = set(person_ids)
             else:
-                names[row["name"].lower()].add(row["id"])
+                names[name].update(person_ids)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
+    for rows in read("movies.csv", ("id", "title", "year"), ingest.keep_rows):
+        for movie_id, title, year in rows:
+            movies[movie_id] = {
+                "title": title,
+                "year": year
             }
+            if not compact:
+                movies[movie_id]["stars"] = set()
+
+    # Load stars, which were grouped by person and by movie in each chunk
+    stars = read("stars.csv", ("person_id", "movie_id"), ingest.group_stars)
+    if compact:
+        graph = load_graph((person_id, movie_id)
+                           for by_person, by_movie in stars
+                           for person_id, movie_ids in by_person.items()
+                           for movie_id in movie_ids)
+        return
+    for by_person, by_movie in stars:
+        # A person's movies are kept even if the movie is unknown, but
+        # a movie's stars only if they are known people
+        for person_id, movie_ids in by_person.items():
+            if person_id in people:
+                people[person_id]["movies"].update(movie_ids)
+        for movie_id, person_ids in by_movie.items():
+            if movie_id in movies:
+                movies[movie_id]["stars"].update(filter(people.__contains__, person_ids))
+
+
+def read_chunks(directory, filename, fields, build, pool=None, jobs=1, progress=None):
+    """
+    Yields build(rows) for each chunk of a CSV file, where rows is a list
+    of tuples of the given fields, built by the pool's processes if a pool
+    is given and in this process otherwise.
+    """
+    path = f"{directory}/{filename}"
+    for rows, partial in ingest.read_csv(pool, path, fields, build, jobs, progress):
+        load_stats["rows"] += rows
+        yield partial
+
+
+def load_graph(stars):
+    """
+    Builds a Graph over the already loaded people and movies
+    from (person_id, movie_id) pairs.
+    """
+    person_ids = list(people)
+    movie_ids = list(movies)
+    person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+    stars_people = array("i")
+    stars_movies = array("i")
+    for person_id, movie_id in stars:
+        try:
+            person = person_index[person_id]
+            movie = movie_index[movie_id]
+        except KeyError:
+            continue
+        stars_people.append(person)
+        stars_movies.append(movie)
+
+    return Graph.from_stars(person_ids, movie_ids, stars_people, stars_movies)
+
+
+def graph_from_sets():
+    """
+    Builds a Graph from the movies sets of the loaded people.
+    """
+    person_ids = list(people)
+    movie_ids = list(movies)
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+    stars_people = array("i")
+    stars_movies = array("i")
+    for person, person_id in enumerate(person_ids):
+        for movie_id in people[person_id]["movies"]:
+            if movie_id in movie_index:
+                stars_people.append(person)
+                stars_movies.append(movie_index[movie_id])
+
+    return Graph.from_stars(person_ids, movie_ids, stars_people, stars_movies)
+
+
+def load_snapshot(directory, compact):
+    """
+    Fills names, people and movies from the directory's snapshot.
+    Returns False if there is no up-to-date snapshot.
+    """
+    global graph, distance_index
+
+    loaded = snapshot.load(directory)
+    if loaded is None:
+        return False
+    (person_ids, person_names, births, movie_ids, titles, years), snapshot_graph, snapshot_index = loaded
+
+    for person_id, name, birth in zip(person_ids, person_names, births):
+        people[person_id] = {"name": name, "birth": birth}
+        if name.lower() not in names:
+            names[name.lower()] = {person_id}
+        else:
+            names[name.lower()].add(person_id)
+    for movie_id, title, year in zip(movie_ids, titles, years):
+        movies[movie_id] = {"title": title, "year": year}
+
+    if compact:
+        graph = snapshot_graph
+        distance_index = snapshot_index
+        return True
 
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    # Rebuild the sets from the graph's arrays
+    for person, person_id in enumerate(person_ids):
+        people[person_id]["movies"] = set()
+    for movie, movie_id in enumerate(movie_ids):
+        stars = set()
+        for i in range(snapshot_graph.movie_offsets[movie], snapshot_graph.movie_offsets[movie + 1]):
+            person_id = person_ids[snapshot_graph.movie_people[i]]
+            stars.add(person_id)
+            people[person_id]["movies"].add(movie_id)
+        movies[movie_id]["stars"] = stars
+    return True
+
+
+def save_snapshot(directory, snapshot_graph):
+    """
+    Writes a snapshot for the next run, unless the directory is read-only.
+    """
+    try:
+        snapshot.save(directory, people, movies, snapshot_graph, distance_index)
+    except OSError:
+        pass
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--bidirectional] [--compact] [--no-snapshot] [--stats] "
+              "[--batch [FILE]] [--serve [PORT]] [--index] [--astar] [--jobs N] [--sqlite FILE] "
+              "[--count] [--alternatives K]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--compact", action="store_true",
+                        help="store who starred in what as an integer graph")
+    parser.add_argument("--no-snapshot", dest="snapshot", action="store_false",
+                        help="always parse the CSV files, without reading or writing a snapshot")
+    parser.add_argument("--stats", action="store_true",
+                        help="report load time, memory and states explored")
+    parser.add_argument("--index", action="store_true",
+                        help="use connected components to answer unconnected pairs at once (implies --compact)")
+    parser.add_argument("--astar", action="store_true",
+                        help="search with A* on landmark distance bounds (implies --index)")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="parse the CSV files with N processes")
+    parser.add_argument("--sqlite", metavar="FILE",
+                        help="read the data from an SQLite database, importing the CSV files into it once")
+    parser.add_argument("--count", action="store_true",
+                        help="also count the distinct shortest connections")
+    parser.add_argument("--alternatives", type=int, default=0, metavar="K",
+                        help="also list up to K distinct shortest connections")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="answer source,target pairs from FILE (or stdin) as JSON lines")
+    parser.add_argument("--serve", nargs="?", const=8050, type=int, metavar="PORT",
+                        help="answer path and name queries over HTTP on localhost")
+    args = parser.parse_args()
+    if args.astar:
+        search = shortest_path_astar
+    elif args.bidirectional:
+        search = shortest_path_bidirectional
+    else:
+        search = shortest_path
+
+    # Keep stdout for results in batch mode
+    log = sys.stderr if args.batch else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    # Peak resident memory in KiB, read around the load rather than traced, so the load runs at full speed
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if args.sqlite:
+        load_database(args.directory, args.sqlite)
+    else:
+        load_data(args.directory, compact=args.compact, use_snapshot=args.snapshot,
+                  build_index=args.index or args.astar, jobs=args.jobs,
+                  progress=functools.partial(print_progress, log) if args.stats else None)
+    elapsed = time.perf_counter() - start
+    print("Data loaded.", file=log)
+    if args.stats:
+        memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak
+        print(f"Loaded in {elapsed:.2f}s, peak memory grew by {memory / 2 ** 10:.1f} MiB.", file=log)
+        if graph is not None:
+            print(f"Graph arrays take {graph.nbytes() / 2 ** 20:.1f} MiB.", file=log)
+        if distance_index is not None:
+            print(f"Distance index takes {distance_index.nbytes() / 2 ** 20:.1f} MiB.", file=log)
+        if load_stats["rows"]:
+            print(f"Parsed {load_stats['rows']} rows at {load_stats['rows'] / elapsed:.0f} rows/s.", file=log)
+        if args.jobs > 1 and load_stats["rows"]:
+            # Largest peak of any one worker, known once the pool has been shut down
+            workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            print(f"Each of {args.jobs} parsing processes peaked at up to {workers / 2 ** 10:.1f} MiB.", file=log)
+
+    if args.batch:
+        if args.batch == "-":
+            answer_batch(sys.stdin, sys.stdout)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                answer_batch(f, sys.stdout)
+        return
+
+    if args.serve is not None:
+        # Plain breadth-first search is never faster than searching from both ends
+        service = server.QueryService(people, names, resolve_person,
+                                      shortest_path_astar if args.astar else shortest_path_bidirectional,
+                                      state_neighbors())
+        server.serve(service, args.serve)
+        return
 
     while True:
         source = person_id_for_name(input("Name: "))
@@ -69,19 +348,36 @@ def main():
         if target is None:
             sys.exit("Person not found.")
 
-        path = shortest_path(source, target)
+        path = search(source, target)
+        if args.stats:
+            print(f"{search_stats['explored']} states explored.")
 
         if path is None:
             print("Not connected.")
         else:
             degrees = len(path)
             print(f"{degrees} degrees of separation.")
-            path = [(None, source)] + path
-            for i in range(degrees):
-                person1 = people[path[i][1]]["name"]
-                person2 = people[path[i + 1][1]]["name"]
-                movie = movies[path[i + 1][0]]["title"]
-                print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+            print_path(source, path)
+
+        if path is not None and args.count:
+            print(f"{count_shortest_paths(source, target)[1]} shortest connections.")
+        if path is not None and args.alternatives:
+            for i, path in enumerate(itertools.islice(all_shortest_paths(source, target), args.alternatives)):
+                print(f"Connection {i + 1}:")
+                print_path(source, path)
+
+
+def print_path(source, path):
+    path = [(None, source)] + path
+    for i in range(len(path) - 1):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+def print_progress(log, path, rows, done, size, seconds):
+    print(f"{path}: {100 * done / size:.0f}% ({rows} rows, {rows / seconds:.0f} rows/s)", file=log)
 
 
 def shortest_path(source, target):
@@ -89,6 +385,280 @@ def shortest_path(source, target):
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    If no possible path, returns None.
+    """
+    return search_graph(breadth_first_search, source, target)
+
+
+def shortest_path_bidirectional(source, target, neighbors=None):
+    """
+    Returns the same kind of path as shortest_path, but searches
+    from the source and the target at the same time.
+
+    `neighbors` is passed on to search_graph.
+    """
+    return search_graph(bidirectional_search, source, target, neighbors)
+
+
+def shortest_path_astar(source, target, neighbors=None):
+    """
+    Returns the same kind of path as shortest_path, found by A* search
+    guided by the landmark distances of the distance index.
+
+    `neighbors` is passed on to search_graph.
+    """
+    if distance_index is None:
+        return shortest_path_bidirectional(source, target, neighbors)
+    bound = distance_index.lower_bound(graph.person_index[target])
+    return search_graph(functools.partial(astar_search, heuristic=bound), source, target, neighbors)
+
+
+def answer_batch(lines, output):
+    """
+    Answers the source,target pairs in `lines`, one pair per CSV line,
+    where each person is given by IMDB id or by an unambiguous name.
+
+    Pairs are grouped by source, so that one breadth-first search from
+    each source answers all of its targets. A JSON object is written to
+    `output` for each pair as soon as its answer is known, with the path,
+    the degrees of separation, the seconds the search spent on it since
+    the previous answer for the same source, and the seconds since that
+    source's search started.
+    """
+    # Map each source to its targets, and each target to the lines asking for it
+    queries = {}
+    for line, row in enumerate(csv.reader(lines), start=1):
+        if not row:
+            continue
+        if len(row) != 2:
+            write_result(output, {"line": line, "error": "expected source,target"})
+            continue
+        source, source_error = resolve_person(row[0])
+        target, target_error = resolve_person(row[1])
+        if source_error or target_error:
+            write_result(output, {"line": line, "error": source_error or target_error})
+            continue
+        queries.setdefault(source, {}).setdefault(target, []).append(line)
+
+    for source, targets in queries.items():
+        start = previous = time.perf_counter()
+        for target, path in shortest_path_tree(source, targets):
+            now = time.perf_counter()
+            elapsed, previous = now - previous, now
+            for line in targets[target]:
+                write_result(output, {
+                    "line": line,
+                    "source": source,
+                    "target": target,
+                    "path": path,
+                    "degrees": None if path is None else len(path),
+                    "seconds": round(elapsed, 6),
+                    "seconds_since_search_start": round(now - start, 6)
+                })
+
+
+def write_result(output, result):
+    output.write(json.dumps(result) + "\n")
+    output.flush()
+
+
+def resolve_person(text):
+    """
+    Returns (person_id, None) for an IMDB id or a name matching
+    exactly one person, and (None, error message) otherwise.
+    """
+    text = text.strip()
+    if text in people:
+        return text, None
+    person_ids = names.get(text.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids)), None
+    if len(person_ids) > 1:
+        return None, f"'{text}' is ambiguous: {', '.join(sorted(person_ids))}"
+    return None, f"'{text}' not found"
+
+
+def shortest_path_tree(source, targets):
+    """
+    Yields (target, path) for each person_id in `targets`, in the order
+    a single breadth-first search from the source reaches them.
+    Targets that cannot be reached are yielded last, with a path of None.
+    """
+    if graph is None:
+        yield from breadth_first_tree(source, targets, state_neighbors())
+        return
+    tree = breadth_first_tree(graph.person_index[source],
+                              [graph.person_index[target] for target in targets],
+                              graph.neighbors)
+    for target, path in tree:
+        yield graph.person_ids[target], graph.path_ids(path)
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns (degrees, count) where count is the number of distinct
+    shortest lists of (movie_id, person_id) pairs from the source to
+    the target, or None if they are not connected.
+
+    Paths are counted layer by layer, without listing any of them.
+    """
+    layers = shortest_path_layers(source, target)
+    if layers is None:
+        return None
+    forward, backward, meeting = layers
+    degrees = forward[meeting[0]][0] + backward[meeting[0]][0]
+    return degrees, sum(forward[state][1] * backward[state][1] for state in meeting)
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs from the
+    source to the target, one at a time. Only the search layers are
+    kept in memory, never the paths already yielded.
+    """
+    layers = shortest_path_layers(source, target)
+    if layers is None:
+        return
+    forward, backward, meeting = layers
+    neighbors = state_neighbors()
+    for state in meeting:
+        for first in paths_to_layer(forward, state, neighbors):
+            for second in paths_from_layer(backward, state, neighbors):
+                path = first + second
+                yield path if graph is None else graph.path_ids(path)
+
+
+def shortest_path_layers(source, target):
+    """
+    Searches from both people at once, like bidirectional_search, and
+    returns (forward, backward, meeting) once the two sides meet.
+
+    forward maps each state reached from the source to (distance, count),
+    where count is the number of distinct shortest paths to it, and
+    backward does the same from the target. Every shortest path passes
+    through exactly one state of `meeting`. Returns None if the two
+    people are not connected.
+    """
+    neighbors = state_neighbors()
+    if graph is not None:
+        source, target = graph.person_index[source], graph.person_index[target]
+        if distance_index is not None and not distance_index.connected(source, target):
+            return None
+
+    forward = {source: (0, 1)}
+    backward = {target: (0, 1)}
+    if source == target:
+        return forward, backward, [source]
+    forward_layer = [source]
+    backward_layer = [target]
+    prefetch = getattr(neighbors, "prefetch", None)
+
+    while forward_layer and backward_layer:
+
+        # Grow the side with fewer people waiting to be expanded
+        from_source = len(forward_layer) <= len(backward_layer)
+        if from_source:
+            layer, reached, other = forward_layer, forward, backward
+        else:
+            layer, reached, other = backward_layer, backward, forward
+
+        # Sum the path counts of every state leading into each new state
+        if prefetch is not None:
+            prefetch(layer)
+        counts = {}
+        for state in layer:
+            count = reached[state][1]
+            for action, neighbor in neighbors(state):
+                if neighbor not in reached:
+                    counts[neighbor] = counts.get(neighbor, 0) + count
+
+        distance = reached[layer[0]][0] + 1
+        for state, count in counts.items():
+            reached[state] = (distance, count)
+
+        # The sides did not overlap before, so they can only meet
+        # between the new layer and the other side's last one
+        meeting = [state for state in counts if state in other]
+        if meeting:
+            return forward, backward, meeting
+
+        next_layer = list(counts)
+        if from_source:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+    return None
+
+
+def paths_to_layer(forward, state, neighbors):
+    """
+    Yields the shortest paths from the source to a state of the forward
+    layers, by stepping back through states one layer closer each time.
+    """
+    distance = forward[state][0]
+    if distance == 0:
+        yield []
+        return
+    for action, neighbor in neighbors(state):
+        if neighbor in forward and forward[neighbor][0] == distance - 1:
+            for path in paths_to_layer(forward, neighbor, neighbors):
+                yield path + [(action, state)]
+
+
+def paths_from_layer(backward, state, neighbors):
+    """
+    Yields the shortest paths from a state of the backward layers to the target.
+    """
+    distance = backward[state][0]
+    if distance == 0:
+        yield []
+        return
+    for action, neighbor in neighbors(state):
+        if neighbor in backward and backward[neighbor][0] == distance - 1:
+            for path in paths_from_layer(backward, neighbor, neighbors):
+                yield [(action, neighbor)] + path
+
+
+def search_graph(search, source, target, neighbors=None):
+    """
+    Runs a search between two person_ids, on the compact graph
+    if it is loaded and on the people and movies sets otherwise.
+
+    `neighbors` replaces the function returned by state_neighbors().
+    """
+    if neighbors is None:
+        neighbors = state_neighbors()
+    if graph is None:
+        return search(source, target, neighbors)
+    source, target = graph.person_index[source], graph.person_index[target]
+
+    # People in different components are never connected
+    if distance_index is not None and not distance_index.connected(source, target):
+        search_stats["explored"] = 0
+        return None
+    return graph.path_ids(search(source, target, neighbors))
+
+
+def state_neighbors():
+    """
+    Returns the neighbors function searches run on: graph.neighbors,
+    working on integer indices, if the compact graph is loaded, the
+    database's cached lookups if one is loaded, and neighbors_for_person
+    otherwise.
+    """
+    if graph is not None:
+        return graph.neighbors
+    if source_database is not None:
+        return source_database.neighbors
+    return neighbors_for_person
+
+
+def breadth_first_search(source, target, neighbors):
+    """
+    Returns the shortest list of (action, state) pairs
+    that connect the source to the target, where `neighbors`
+    returns the (action, state) pairs reachable from a state.
+
     If no possible path, returns None.
     """
 
@@ -108,6 +678,7 @@ def shortest_path(source, target):
 
         # If nothing left in frontier, then no path
         if frontier.empty():
+            search_stats["explored"] = num_explored
             return None
 
         # Choose a node from the frontier
@@ -118,7 +689,7 @@ def shortest_path(source, target):
         explored.add(node.state)
 
         # Add neighbors to frontier
-        for action, state in neighbors_for_person(node.state):
+        for action, state in neighbors(node.state):
 
             if not frontier.contains_state(state) and state not in explored:
                 child = Node(state=state, parent=node, action=action)
@@ -130,10 +701,185 @@ def shortest_path(source, target):
                         path.append((node.action, node.state))
                         node = node.parent
                     path.reverse()
+                    search_stats["explored"] = num_explored
                     return path
                 frontier.add(child)
 
 
+def breadth_first_tree(source, targets, neighbors):
+    """
+    Grows one breadth-first search tree from the source and yields
+    (target, path) for each of the targets as soon as it is reached.
+    The search stops once every target has been found.
+    """
+    remaining = set(targets)
+    parents = {source: None}
+    if source in remaining:
+        remaining.remove(source)
+        yield source, []
+    layer = [source]
+    num_explored = 0
+
+    # Neighbors may be loaded a whole layer at a time
+    prefetch = getattr(neighbors, "prefetch", None)
+
+    while layer and remaining:
+        if prefetch is not None:
+            prefetch(layer)
+        next_layer = []
+        for state in layer:
+            num_explored += 1
+            for action, neighbor in neighbors(state):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (action, state)
+                if neighbor in remaining:
+                    remaining.remove(neighbor)
+                    search_stats["explored"] = num_explored
+                    yield neighbor, tree_path(parents, neighbor)
+                next_layer.append(neighbor)
+        layer = next_layer
+
+    search_stats["explored"] = num_explored
+    for target in remaining:
+        yield target, None
+
+
+def tree_path(parents, state):
+    """
+    Returns the (action, state) pairs leading from the root of
+    a search tree to the given state.
+    """
+    path = []
+    while parents[state] is not None:
+        action, parent = parents[state]
+        path.append((action, state))
+        state = parent
+    path.reverse()
+    return path
+
+
+def astar_search(source, target, neighbors, heuristic):
+    """
+    Returns the same kind of path as breadth_first_search, expanding
+    states in order of their distance from the source plus heuristic(state),
+    which must never overestimate the distance left to the target.
+    """
+    num_explored = 0
+    distance = {source: 0}
+
+    # Prioritize by (estimated path length, -distance so far); among equal
+    # estimates, states closer to the target are expanded first
+    frontier = PriorityFrontier()
+    frontier.add(Node(state=source, parent=None, action=None), (heuristic(source), 0))
+    explored = set()
+
+    while not frontier.empty():
+        node = frontier.remove()
+        if node.state == target:
+            search_stats["explored"] = num_explored
+            path = []
+            while node.parent is not None:
+                path.append((node.action, node.state))
+                node = node.parent
+            path.reverse()
+            return path
+        if node.state in explored:
+            continue
+        explored.add(node.state)
+        num_explored += 1
+
+        for action, state in neighbors(node.state):
+            cost = distance[node.state] + 1
+            if state not in distance or cost < distance[state]:
+                distance[state] = cost
+                child = Node(state=state, parent=node, action=action)
+                frontier.add(child, (cost + heuristic(state), -cost))
+
+    search_stats["explored"] = num_explored
+    return None
+
+
+def bidirectional_search(source, target, neighbors):
+    """
+    Returns the same kind of path as breadth_first_search, but searches
+    from the source and the target at the same time.
+
+    Each step expands one whole layer of the smaller side, so both
+    searches stay shallow. Reached people are kept in dictionaries,
+    which makes every visited and frontier check constant-time.
+    """
+    if source == target:
+        search_stats["explored"] = 0
+        return []
+
+    # Map each reached person to the (movie_id, person_id) step
+    # leading back towards the side it was reached from
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+    num_explored = 0
+
+    # Neighbors may be loaded a whole layer at a time
+    prefetch = getattr(neighbors, "prefetch", None)
+
+    while forward_layer and backward_layer:
+
+        # Always grow the side with fewer people waiting to be expanded
+        from_source = len(forward_layer) <= len(backward_layer)
+        if from_source:
+            layer, reached, other = forward_layer, forward, backward
+        else:
+            layer, reached, other = backward_layer, backward, forward
+
+        if prefetch is not None:
+            prefetch(layer)
+        next_layer = []
+        for person_id in layer:
+            num_explored += 1
+            for movie_id, neighbor_id in neighbors(person_id):
+                if neighbor_id in reached:
+                    continue
+                reached[neighbor_id] = (movie_id, person_id)
+
+                # The first meeting point lies on a shortest path, because
+                # the two sides did not overlap before this layer
+                if neighbor_id in other:
+                    search_stats["explored"] = num_explored
+                    return join_paths(forward, backward, neighbor_id)
+                next_layer.append(neighbor_id)
+
+        if from_source:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    search_stats["explored"] = num_explored
+    return None
+
+
+def join_paths(forward, backward, meeting_id):
+    """
+    Returns the (movie_id, person_id) pairs from the source to the target
+    going through the person where both searches met.
+    """
+    path = []
+    person_id = meeting_id
+    while forward[person_id] is not None:
+        movie_id, previous_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = previous_id
+    path.reverse()
+
+    person_id = meeting_id
+    while backward[person_id] is not None:
+        movie_id, next_id = backward[person_id]
+        path.append((movie_id, next_id))
+        person_id = next_id
+    return path
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -165,6 +911,10 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
+    if source_database is not None:
+        return source_database.neighbors(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
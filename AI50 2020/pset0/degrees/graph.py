@@ -0,0 +1,92 @@
+from array import array
+
+
+class Graph():
+    """
+    People and movies interned to dense integers, with person -> movies and
+    movie -> people adjacency stored as compressed sparse rows.
+
+    The stars of movie m are targets[offsets[m]:offsets[m + 1]], and the
+    same goes for the movies of a person.
+    """
+
+    def __init__(self, person_ids, movie_ids, person_movies, movie_people):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_offsets, self.person_movies = person_movies
+        self.movie_offsets, self.movie_people = movie_people
+
+    @classmethod
+    def from_stars(cls, person_ids, movie_ids, stars_people, stars_movies):
+        """
+        Builds the graph from two parallel arrays of person and movie
+        indices, one entry per row of stars.csv.
+        """
+        return cls(person_ids, movie_ids,
+                   compress(len(person_ids), stars_people, stars_movies),
+                   compress(len(movie_ids), stars_movies, stars_people))
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred with
+        the given person, without building any intermediate collection.
+        """
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+        for i in range(self.person_offsets[person], self.person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_people[j]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Same as neighbors, but takes and yields IMDB ids.
+        """
+        for movie, person in self.neighbors(self.person_index[person_id]):
+            yield self.movie_ids[movie], self.person_ids[person]
+
+    def path_ids(self, path):
+        """
+        Converts a path of (movie, person) indices into IMDB ids.
+        """
+        if path is None:
+            return None
+        return [(self.movie_ids[movie], self.person_ids[person]) for movie, person in path]
+
+    def nbytes(self):
+        """
+        Returns the size of the adjacency arrays in bytes.
+        """
+        arrays = (self.person_offsets, self.person_movies, self.movie_offsets, self.movie_people)
+        return sum(len(a) * a.itemsize for a in arrays)
+
+
+def compress(rows, sources, targets):
+    """
+    Returns (offsets, targets) arrays grouping targets by their source,
+    with duplicate edges removed and each row sorted.
+    """
+    # Count the edges of each row, then turn counts into offsets
+    counts = array("i", bytes(4 * (rows + 1)))
+    for source in sources:
+        counts[source + 1] += 1
+    for i in range(rows):
+        counts[i + 1] += counts[i]
+
+    # Place each target into its row
+    grouped = array("i", bytes(4 * len(sources)))
+    position = array("i", counts)
+    for source, target in zip(sources, targets):
+        grouped[position[source]] = target
+        position[source] += 1
+
+    # Drop repeated rows of stars.csv, like the original sets did
+    offsets = array("i", [0])
+    compressed = array("i")
+    for i in range(rows):
+        compressed.extend(sorted(set(grouped[counts[i]:counts[i + 1]])))
+        offsets.append(len(compressed))
+    return offsets, compressed
@@ -0,0 +1,117 @@
+import csv
+import io
+import os
+import time
+
+# Chunks handed to each worker process, and the smallest chunk worth sending
+CHUNKS_PER_JOB = 4
+MIN_CHUNK_SIZE = 1 << 20
+
+
+def read_csv(pool, path, fields, build, jobs=1, progress=None):
+    """
+    Parses the CSV file at `path` in byte-range chunks, and yields
+    (rows, build(chunk)) for each chunk in file order, where chunk is the
+    list of tuples of the requested fields and rows its length.
+
+    Chunks are parsed and built by the pool's processes if a pool is given,
+    and one at a time in this process otherwise, so both paths read the
+    file the same way. Chunks are split at line boundaries, so fields must
+    not contain newlines. If given, progress(path, rows, done, size, seconds)
+    is called as each chunk is merged.
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(path)
+    columns, ranges = chunk_ranges(path, fields, jobs * CHUNKS_PER_JOB)
+
+    if pool is not None:
+        results = [pool.submit(parse_chunk, path, first, last, columns, build) for first, last in ranges]
+    else:
+        results = None
+
+    rows = 0
+    for i, (first, last) in enumerate(ranges):
+        if results is not None:
+            count, partial = results[i].result()
+        else:
+            count, partial = parse_chunk(path, first, last, columns, build)
+        rows += count
+        yield count, partial
+        if progress is not None:
+            progress(path, rows, last, size, time.perf_counter() - start)
+
+
+def chunk_ranges(path, fields, count):
+    """
+    Returns the column numbers of the requested fields, and a list of
+    (start, end) byte ranges covering every line after the header.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        columns = [header.index(field) for field in fields]
+
+        ranges = []
+        start = f.tell()
+        step = max(MIN_CHUNK_SIZE, (size - start) // count + 1)
+        while start < size:
+            end = start + step
+            if end >= size:
+                end = size
+            else:
+                # Move the end past the next newline, so no line gets split
+                f.seek(end - 1)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return columns, ranges
+
+
+def parse_chunk(path, start, end, columns, build):
+    """
+    Returns the number of rows between two byte offsets of a CSV file,
+    and build applied to the list of tuples of their given columns.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    # Missing fields become None, as they would with csv.DictReader
+    rows = []
+    for row in csv.reader(io.StringIO(text)):
+        if row:
+            rows.append(tuple(row[i] if i < len(row) else None for i in columns))
+    return len(rows), build(rows)
+
+
+def keep_rows(rows):
+    """
+    Returns the rows as they are, for files merged row by row.
+    """
+    return rows
+
+
+def index_names(rows):
+    """
+    Returns the (id, name, birth) rows of people.csv with the part of the
+    name index they make: each lowercase name mapped to a list of person ids.
+    """
+    index = {}
+    for person_id, name, birth in rows:
+        index.setdefault(name.lower(), []).append(person_id)
+    return rows, index
+
+
+def group_stars(rows):
+    """
+    Returns the (person_id, movie_id) rows of stars.csv grouped both ways,
+    as dicts of each person id to its movie ids and each movie id to its
+    person ids, in the order of the rows.
+    """
+    by_person = {}
+    by_movie = {}
+    for person_id, movie_id in rows:
+        by_person.setdefault(person_id, []).append(movie_id)
+        by_movie.setdefault(movie_id, []).append(person_id)
+    return by_person, by_movie
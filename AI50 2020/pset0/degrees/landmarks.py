@@ -0,0 +1,129 @@
+from array import array
+
+# Number of landmarks whose distances are stored for every person
+LANDMARKS = 8
+
+# Distance to people a landmark cannot reach
+UNREACHABLE = -1
+
+
+class DistanceIndex():
+    """
+    Precomputed facts about a Graph that speed up searches on it.
+
+    component[p] labels the connected component of person p, so two
+    people are connected exactly when their labels match.
+    distances[p * count + k] is the degrees of separation between
+    person p and landmarks[k], which gives lower bounds for A* search.
+    """
+
+    def __init__(self, component, landmarks, distances):
+        self.component = component
+        self.landmarks = landmarks
+        self.distances = distances
+        self.count = len(landmarks)
+
+    @classmethod
+    def build(cls, graph, count=LANDMARKS):
+        """
+        Labels the components of the graph and picks `count` landmarks in
+        its largest component, each one as far as possible from the others.
+        """
+        people = len(graph.person_ids)
+        component = array("i", [UNREACHABLE]) * people
+        sizes = []
+        seen_movies = bytearray(len(graph.movie_ids))
+        for person in range(people):
+            if component[person] == UNREACHABLE:
+                sizes.append(breadth_first_layers(graph, person, component, len(sizes), seen_movies))
+
+        landmarks = array("i")
+        if not sizes:
+            return cls(component, landmarks, array("h"))
+
+        # Start from the best connected person of the largest component
+        largest = max(range(len(sizes)), key=lambda label: sizes[label])
+        members = [person for person in range(people) if component[person] == largest]
+        landmark = max(members, key=lambda person: graph.person_offsets[person + 1] - graph.person_offsets[person])
+        count = min(count, len(members))
+        distances = array("h", [UNREACHABLE]) * (people * count)
+
+        # Each next landmark is the member farthest from all landmarks so far
+        nearest = {person: people for person in members}
+        for k in range(count):
+            landmarks.append(landmark)
+            distance = array("h", [UNREACHABLE]) * people
+            breadth_first_layers(graph, landmark, distance)
+            for person in members:
+                distances[person * count + k] = distance[person]
+                nearest[person] = min(nearest[person], distance[person])
+            landmark = max(members, key=nearest.get)
+
+        return cls(component, landmarks, distances)
+
+    def connected(self, source, target):
+        """
+        Returns True if there is a path between the two people.
+        """
+        return self.component[source] == self.component[target]
+
+    def lower_bound(self, target):
+        """
+        Returns a function giving, for any person in the target's component,
+        a lower bound on their degrees of separation from the target.
+        """
+        count = self.count
+        if count == 0 or self.component[target] != self.component[self.landmarks[0]]:
+            return lambda person: 0
+        distances = self.distances
+        goal = distances[target * count:(target + 1) * count]
+
+        def bound(person):
+            row = distances[person * count:(person + 1) * count]
+            return max(abs(a - b) for a, b in zip(row, goal))
+        return bound
+
+    def nbytes(self):
+        """
+        Returns the size of the index arrays in bytes.
+        """
+        return sum(len(a) * a.itemsize for a in (self.component, self.landmarks, self.distances))
+
+
+def breadth_first_layers(graph, start, labels, label=None, seen_movies=None):
+    """
+    Visits everyone connected to the start person, setting labels[p] to
+    `label` or, if no label is given, to p's degrees of separation from
+    the start. Only people whose label is UNREACHABLE are visited.
+    Returns the number of visited people.
+
+    Movies already marked in `seen_movies` are not expanded again, which
+    lets one bytearray be shared while labelling separate components.
+    """
+    person_offsets, person_movies = graph.person_offsets, graph.person_movies
+    movie_offsets, movie_people = graph.movie_offsets, graph.movie_people
+
+    # Every movie links all of its stars, so it only needs expanding once
+    if seen_movies is None:
+        seen_movies = bytearray(len(graph.movie_ids))
+    labels[start] = 0 if label is None else label
+    visited = 1
+    layer = [start]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            for i in range(person_offsets[person], person_offsets[person + 1]):
+                movie = person_movies[i]
+                if seen_movies[movie]:
+                    continue
+                seen_movies[movie] = 1
+                for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                    star = movie_people[j]
+                    if labels[star] == UNREACHABLE:
+                        labels[star] = depth if label is None else label
+                        next_layer.append(star)
+        visited += len(next_layer)
+        layer = next_layer
+    return visited
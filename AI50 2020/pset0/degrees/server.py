@@ -0,0 +1,144 @@
+import functools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Default number of entries kept by each cache
+PATH_CACHE_SIZE = 4096
+NEIGHBOR_CACHE_SIZE = 65536
+
+
+class QueryService():
+    """
+    Answers degrees queries on data that is already loaded, keeping LRU
+    caches of recent paths and of per-person neighbor lists.
+
+    `resolve(text)` returns (person_id, error) for an id or a name, and
+    `search(source, target, neighbors)` returns the path between two
+    person_ids using the given neighbors function, which wraps `neighbors`
+    unless it has a cache of its own.
+    """
+
+    def __init__(self, people, names, resolve, search, neighbors,
+                 path_cache_size=PATH_CACHE_SIZE, neighbor_cache_size=NEIGHBOR_CACHE_SIZE):
+        self.people = people
+        self.names = names
+        self.resolve = resolve
+        # A neighbors function that caches and prefetches by itself, like the
+        # database's, is used as it is so searches keep their batched lookups
+        if hasattr(neighbors, "prefetch"):
+            self.neighbors = neighbors
+        else:
+            self.neighbors = functools.lru_cache(maxsize=neighbor_cache_size)(
+                lambda state: tuple(neighbors(state))
+            )
+        self.shortest_path = functools.lru_cache(maxsize=path_cache_size)(
+            lambda source, target: search(source, target, self.neighbors)
+        )
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def path(self, source, target):
+        """
+        Returns (HTTP status, response) for a shortest path query.
+        """
+        self.count_request()
+        start = time.perf_counter()
+        source_id, source_error = self.resolve(source)
+        target_id, target_error = self.resolve(target)
+        if source_error or target_error:
+            return 400, {"error": source_error or target_error}
+
+        path = self.shortest_path(source_id, target_id)
+        return 200, {
+            "source": source_id,
+            "target": target_id,
+            "path": path,
+            "degrees": None if path is None else len(path),
+            "seconds": round(time.perf_counter() - start, 6)
+        }
+
+    def person(self, name):
+        """
+        Returns (HTTP status, response) listing everyone with the given name.
+        """
+        self.count_request()
+        person_ids = sorted(self.names.get(name.lower(), set()))
+        if not person_ids:
+            return 404, {"error": f"'{name}' not found"}
+        return 200, {"people": [
+            {"id": person_id, "name": self.people[person_id]["name"], "birth": self.people[person_id]["birth"]}
+            for person_id in person_ids
+        ]}
+
+    def stats(self):
+        """
+        Returns (HTTP status, response) with request and cache hit counts.
+        """
+        return 200, {
+            "requests": self.requests,
+            "path_cache": cache_stats(self.shortest_path),
+            "neighbor_cache": cache_stats(self.neighbors)
+        }
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+
+def cache_stats(cached):
+    info = cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else None
+    }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /path?source=...&target=..., /person?name=... and /stats,
+    where people are given by IMDB id or by name.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+
+        if url.path == "/path":
+            status, response = service.path(query.get("source", ""), query.get("target", ""))
+        elif url.path == "/person":
+            status, response = service.person(query.get("name", ""))
+        elif url.path == "/stats":
+            status, response = service.stats()
+        else:
+            status, response = 404, {"error": "unknown endpoint"}
+
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(service, port, host="127.0.0.1"):
+    """
+    Answers HTTP requests with the query service until interrupted,
+    handling each request in its own thread.
+    """
+    httpd = ThreadingHTTPServer((host, port), RequestHandler)
+    httpd.service = service
+    print(f"Serving on http://{host}:{httpd.server_port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,150 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import zlib
+from graph import Graph
+from landmarks import DistanceIndex
+
+# Bump whenever the layout below changes, so old snapshots get rebuilt
+VERSION = 3
+
+MAGIC = b"DEGREES\0"
+FILENAME = "degrees.snapshot"
+CSV_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+# Snapshot layout:
+#   MAGIC, then version and header length as little-endian uint32,
+#   then a JSON header describing the sections that follow it, with
+#   the CRC-32 of each so that damaged data is rebuilt rather than used.
+# Sections start on 8-byte boundaries. The first one is a pickle of the
+# people and movies details, the next four are the graph's int32 arrays,
+# and a DistanceIndex may add its three arrays after them. All arrays are
+# used straight from the memory map.
+PREFIX = struct.Struct("<II")
+ALIGNMENT = 8
+
+
+def source_key(directory):
+    """
+    Returns the size and modification time of each CSV file,
+    which a snapshot must match to be reused.
+    """
+    key = []
+    for filename in CSV_FILES:
+        stat = os.stat(os.path.join(directory, filename))
+        key.append([filename, stat.st_size, stat.st_mtime_ns])
+    return key
+
+
+def save(directory, people, movies, graph, index=None):
+    """
+    Writes a snapshot of the loaded data next to the CSV files.
+    """
+    details = pickle.dumps((
+        graph.person_ids,
+        [people[person_id]["name"] for person_id in graph.person_ids],
+        [people[person_id]["birth"] for person_id in graph.person_ids],
+        graph.movie_ids,
+        [movies[movie_id]["title"] for movie_id in graph.movie_ids],
+        [movies[movie_id]["year"] for movie_id in graph.movie_ids]
+    ), protocol=pickle.HIGHEST_PROTOCOL)
+    sections = [details] + [bytes(a) for a in (graph.person_offsets, graph.person_movies,
+                                               graph.movie_offsets, graph.movie_people)]
+    if index is not None:
+        sections += [bytes(a) for a in (index.component, index.landmarks, index.distances)]
+
+    # Lay the sections out one after another, padded to ALIGNMENT
+    layout = []
+    offset = 0
+    for section in sections:
+        layout.append([offset, len(section)])
+        offset = align(offset + len(section))
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "source": source_key(directory),
+        "sections": layout,
+        "checksums": [zlib.crc32(section) for section in sections]
+    }).encode()
+    start = align(len(MAGIC) + PREFIX.size + len(header))
+
+    # Write to a temporary file first, so a crash never leaves half a snapshot
+    path = os.path.join(directory, FILENAME)
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + PREFIX.pack(VERSION, len(header)) + header)
+        for (offset, _), section in zip(layout, sections):
+            f.seek(start + offset)
+            f.write(section)
+    os.replace(path + ".tmp", path)
+
+
+def load(directory):
+    """
+    Returns (details, graph, index) from the directory's snapshot, or None
+    if there is no snapshot, it does not match the CSV files or it is damaged.
+    The index is None if the snapshot was saved without one.
+    """
+    path = os.path.join(directory, FILENAME)
+    if not os.path.exists(path) or os.path.getsize(path) < len(MAGIC) + PREFIX.size:
+        return None
+
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # A truncated or edited snapshot is rebuilt like an outdated one
+    try:
+        return decode(directory, buffer)
+    except (ValueError, KeyError, TypeError, IndexError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def decode(directory, buffer):
+    """
+    Returns load's result from the snapshot's memory map, raising ValueError
+    if a section or the header lies outside it or fails its checksum.
+    """
+    prefix_end = len(MAGIC) + PREFIX.size
+    if buffer[:len(MAGIC)] != MAGIC:
+        return None
+    version, header_length = PREFIX.unpack(buffer[len(MAGIC):prefix_end])
+    if version != VERSION:
+        return None
+    if prefix_end + header_length > len(buffer):
+        raise ValueError("snapshot header is truncated")
+    header = json.loads(buffer[prefix_end:prefix_end + header_length])
+    if header["byteorder"] != sys.byteorder or header["source"] != source_key(directory):
+        return None
+
+    start = align(prefix_end + header_length)
+    layout = header["sections"]
+    if len(layout) not in (5, 8):
+        raise ValueError(f"snapshot has {len(layout)} sections")
+    for offset, length in layout:
+        if offset < 0 or length < 0 or start + offset + length > len(buffer):
+            raise ValueError("snapshot section is truncated")
+
+    view = memoryview(buffer)
+    sections = [view[start + offset:start + offset + length] for offset, length in layout]
+    if [zlib.crc32(section) for section in sections] != header["checksums"]:
+        raise ValueError("snapshot section is damaged")
+    details = pickle.loads(sections[0])
+    if not isinstance(details, tuple) or len(details) != 6:
+        raise ValueError("snapshot details are damaged")
+    person_offsets, person_movies, movie_offsets, movie_people = (
+        section.cast("i") for section in sections[1:5]
+    )
+    if len(person_offsets) != len(details[0]) + 1 or len(movie_offsets) != len(details[3]) + 1:
+        raise ValueError("snapshot graph does not match its details")
+    graph = Graph(details[0], details[3], (person_offsets, person_movies), (movie_offsets, movie_people))
+
+    index = None
+    if len(sections) > 5:
+        component, landmarks, distances = sections[5:]
+        index = DistanceIndex(component.cast("i"), landmarks.cast("i"), distances.cast("h"))
+    return details, graph, index
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -1,4 +1,11 @@
+import heapq
+import itertools
+from collections import deque
+
+
 class Node():
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -7,25 +14,49 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Number of nodes in the frontier for each state, for O(1) contains_state
+        self.states = {}
+
+        # Counters for comparing searches
+        self.pushes = 0
+        self.pops = 0
+        self.peak_size = 0
 
     def add(self, node):
         self.frontier.append(node)
+        self.added(node)
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
 
+    def __len__(self):
+        return len(self.frontier)
+
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.removed(node)
             return node
 
+    def added(self, node):
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+        self.pushes += 1
+        self.peak_size = max(self.peak_size, len(self.frontier))
+
+    def removed(self, node):
+        if self.states[node.state] == 1:
+            del self.states[node.state]
+        else:
+            self.states[node.state] -= 1
+        self.pops += 1
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +64,32 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.removed(node)
+            return node
+
+
+class PriorityFrontier(StackFrontier):
+    """
+    Removes the node with the lowest priority first, and among equal
+    priorities the one added first. A state may be added again with a
+    better priority; the outdated node is still removed later, so
+    callers should skip states they have already explored.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.frontier = []
+        self.counter = itertools.count()
+
+    def add(self, node, priority=0):
+        heapq.heappush(self.frontier, (priority, next(self.counter), node))
+        self.added(node)
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = heapq.heappop(self.frontier)[2]
+            self.removed(node)
             return node
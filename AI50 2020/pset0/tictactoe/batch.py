@@ -0,0 +1,97 @@
+"""
+Tic Tac Toe rules for many boards at once
+
+Boards are an (N, 3, 3) NumPy array holding 1 for X, -1 for O and 0 for an empty square,
+as made by encode. Every function answers for all N boards with a few array operations.
+"""
+
+import time
+
+import numpy
+
+import tictactoe
+
+# Squares (3 * i + j) of each winning shape, in the order tictactoe.winner checks them
+lines = numpy.array([[3 * y + x for y, x in shape] for shape in tictactoe.winning_shapes])
+
+# Boards scored at a time, to bound the memory used for the line sums
+CHUNK_SIZE = 1 << 20
+
+
+def encode(boards):
+    """Returns the (N, 3, 3) int8 array for a list of list-of-lists boards, or an array of X, O and None"""
+    boards = numpy.asarray(boards, dtype=object)
+    return ((boards == tictactoe.X).astype(numpy.int8) - (boards == tictactoe.O)).astype(numpy.int8)
+
+
+def line_sums(boards):
+    """Returns an (N, 8) array of each winning shape's sum: 3 if X holds it, -3 if O does"""
+    squares = boards.reshape(len(boards), 9).astype(numpy.int8)
+    return squares[:, lines].sum(axis=2, dtype=numpy.int8)
+
+
+def winner(boards):
+    """
+    Returns 1 where X has won, -1 where O has won and 0 elsewhere.
+    Like tictactoe.winner, the first complete shape decides on boards with more than one.
+    """
+    sums = line_sums(boards)
+    complete = numpy.abs(sums) == 3
+    first = complete.argmax(axis=1)
+    return numpy.where(complete.any(axis=1), sums[numpy.arange(len(sums)), first] // 3, 0).astype(numpy.int8)
+
+
+def to_move(boards):
+    """Returns 1 where X has the next turn and -1 where O does"""
+    counts = boards.reshape(len(boards), 9).sum(axis=1, dtype=numpy.int16)
+    return numpy.where(counts > 0, -1, 1).astype(numpy.int8)
+
+
+def evaluate(boards, chunk_size=CHUNK_SIZE):
+    """
+    Returns (winner, terminal, utility, to_move) arrays for an (N, 3, 3) array of boards.
+
+    winner and to_move use 1 for X and -1 for O (winner is 0 if nobody has won), terminal is
+    True where the game is over and utility is as in tictactoe.utility, so it equals winner.
+    """
+    boards = numpy.asarray(boards, dtype=numpy.int8)
+    count = len(boards)
+    winners = numpy.empty(count, dtype=numpy.int8)
+    terminals = numpy.empty(count, dtype=bool)
+    players = numpy.empty(count, dtype=numpy.int8)
+
+    for start in range(0, count, chunk_size):
+        chunk = boards[start:start + chunk_size]
+        winners[start:start + chunk_size] = winner(chunk)
+        full = (chunk.reshape(len(chunk), 9) != 0).all(axis=1)
+        terminals[start:start + chunk_size] = (winners[start:start + chunk_size] != 0) | full
+        players[start:start + chunk_size] = to_move(chunk)
+
+    return winners, terminals, winners.copy(), players
+
+
+def benchmark(count=100000, seed=0):
+    """Prints boards per second of evaluate and of calling tictactoe's functions on each board"""
+    boards = numpy.random.default_rng(seed).integers(-1, 2, size=(count, 3, 3), dtype=numpy.int8)
+
+    start = time.perf_counter()
+    winners, terminals, utilities, players = evaluate(boards)
+    vectorized = time.perf_counter() - start
+
+    symbols = {1: tictactoe.X, -1: tictactoe.O, 0: tictactoe.EMPTY}
+    lists = [[[symbols[square] for square in row] for row in board] for board in boards.tolist()]
+    start = time.perf_counter()
+    expected = [(tictactoe.utility(board), tictactoe.terminal(board), tictactoe.player(board)) for board in lists]
+    looped = time.perf_counter() - start
+
+    agrees = all(
+        (utility, terminal, player) == (int(utilities[i]), bool(terminals[i]), symbols[int(players[i])])
+        for i, (utility, terminal, player) in enumerate(expected)
+    )
+    print(f"vectorized: {count / vectorized:.0f} boards/s")
+    print(f"    looped: {count / looped:.0f} boards/s")
+    print("results agree" if agrees else "RESULTS DIFFER")
+
+
+if __name__ == "__main__":
+    benchmark()
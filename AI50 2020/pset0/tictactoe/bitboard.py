@@ -0,0 +1,135 @@
+"""
+Tic Tac Toe engine on bitboards
+
+A position is two 9-bit integers, one per player, where square (i, j) is bit 3 * i + j.
+"""
+
+import time
+
+import tictactoe
+
+X_BITS = 0
+O_BITS = 1
+
+FULL = (1 << 9) - 1
+
+# One mask per winning shape, and for each square the masks of the shapes through it
+win_masks = [sum(1 << (3 * y + x) for y, x in shape) for shape in tictactoe.winning_shapes]
+masks_through = [[mask for mask in win_masks if mask & (1 << square)] for square in range(9)]
+
+# Squares in the order moves are tried: center, corners, then edges
+move_order = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+# Number of positions searched since the last reset
+search_stats = {"nodes": 0}
+
+
+def from_board(board):
+    """Returns [X bits, O bits] for a list-of-lists board"""
+    bits = [0, 0]
+    for y in range(3):
+        for x in range(3):
+            if board[y][x] == tictactoe.X:
+                bits[X_BITS] |= 1 << (3 * y + x)
+            elif board[y][x] == tictactoe.O:
+                bits[O_BITS] |= 1 << (3 * y + x)
+    return bits
+
+
+def to_board(bits):
+    """Returns the list-of-lists board for [X bits, O bits]"""
+    board = tictactoe.initial_state()
+    for square in range(9):
+        if bits[X_BITS] & (1 << square):
+            board[square // 3][square % 3] = tictactoe.X
+        elif bits[O_BITS] & (1 << square):
+            board[square // 3][square % 3] = tictactoe.O
+    return board
+
+
+def to_move(bits):
+    """Returns X_BITS or O_BITS for the side whose turn it is"""
+    return O_BITS if bin(bits[X_BITS]).count("1") > bin(bits[O_BITS]).count("1") else X_BITS
+
+
+def won(side_bits):
+    """Returns True if the given player's squares complete a winning shape"""
+    for mask in win_masks:
+        if side_bits & mask == mask:
+            return True
+    return False
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the board, like tictactoe.minimax.
+    """
+    bits = from_board(board)
+    if won(bits[X_BITS]) or won(bits[O_BITS]) or bits[X_BITS] | bits[O_BITS] == FULL:
+        return None
+    square = search(bits, to_move(bits), -2, 2)[1]
+    return square // 3, square % 3
+
+
+def search(bits, side, alpha, beta):
+    """Returns (value, square) of the best move for `side`, with alpha-beta pruning
+
+    Moves are made in `bits` by setting a bit and undone by clearing it, so no board is ever copied.
+    Values are 1 if X wins, -1 if O wins and 0 for a draw, as in tictactoe.utility.
+    """
+    search_stats["nodes"] += 1
+    empty = FULL & ~(bits[X_BITS] | bits[O_BITS])
+    best_value = -2 if side == X_BITS else 2
+    best_square = None
+
+    for square in move_order:
+        bit = 1 << square
+        if not empty & bit:
+            continue
+
+        # make the move, score it, then take it back
+        bits[side] |= bit
+        if any(bits[side] & mask == mask for mask in masks_through[square]):
+            value = 1 if side == X_BITS else -1
+        elif empty == bit:
+            value = 0
+        else:
+            value = search(bits, 1 - side, alpha, beta)[0]
+        bits[side] ^= bit
+
+        if side == X_BITS:
+            if value > best_value:
+                best_value, best_square = value, square
+                alpha = max(alpha, value)
+        else:
+            if value < best_value:
+                best_value, best_square = value, square
+                beta = min(beta, value)
+        if alpha >= beta:
+            break
+
+    return best_value, best_square
+
+
+def benchmark(board=None, repeat=5):
+    """Prints nodes per second of this engine and of tictactoe.bestmove, each searching the board afresh"""
+    if board is None:
+        board = tictactoe.initial_state()
+
+    # tictactoe.bestmove rather than minimax, which would answer from the solved table if built
+    for name, engine, stats in (("tictactoe", lambda board: tictactoe.bestmove(board, 0), tictactoe.search_stats),
+                                ("bitboard", minimax, search_stats)):
+        nodes = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            tictactoe.transpositions.clear()
+            stats["nodes"] = 0
+            engine(board)
+            nodes += stats["nodes"]
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {nodes // repeat} nodes, {elapsed / repeat * 1000:.1f} ms per search, "
+              f"{nodes / elapsed:.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    benchmark()
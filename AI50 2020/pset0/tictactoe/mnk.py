@@ -0,0 +1,441 @@
+"""
+m,n,k-game engine: Tic Tac Toe on any board size and win length
+
+Positions are bitboards like in bitboard.py: [X bits, O bits], where square (i, j) is bit i * columns + j.
+Boards too large to search to the end are searched by iterative deepening alpha-beta with a
+heuristic evaluation, killer and history move ordering, and a wall-clock budget per move.
+ParallelSearch spreads a fixed-depth search over a process pool instead.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import tictactoe
+
+X_BITS = 0
+O_BITS = 1
+
+# Score of a won position, minus the number of moves it takes, so faster wins score higher
+WIN = 1000000
+
+# Nodes searched between two looks at the clock
+CLOCK_INTERVAL = 1024
+
+
+class Timeout(Exception):
+    pass
+
+
+class Game():
+    """Board size, win length and the masks derived from them
+
+    Only empty squares within `radius` of a stone are tried as moves; None tries every empty square.
+    """
+
+    def __init__(self, rows=3, columns=3, k=3, radius=None):
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.radius = radius
+        self.squares = rows * columns
+        self.full = (1 << self.squares) - 1
+
+        # every line of k squares, and for each square the lines through it
+        self.windows = []
+        for y in range(rows):
+            for x in range(columns):
+                for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_y, end_x = y + dy * (k - 1), x + dx * (k - 1)
+                    if 0 <= end_y < rows and 0 <= end_x < columns:
+                        self.windows.append(sum(1 << ((y + dy * i) * columns + x + dx * i) for i in range(k)))
+        self.windows_through = [[w for w in self.windows if w & (1 << square)] for square in range(self.squares)]
+
+        # columns a stone can spread from without wrapping to the next row
+        self.not_first_column = self.full & ~sum(1 << (y * columns) for y in range(rows))
+        self.not_last_column = self.full & ~sum(1 << (y * columns + columns - 1) for y in range(rows))
+
+        # squares closer to the center are tried first among otherwise equal moves
+        center_y, center_x = (rows - 1) / 2, (columns - 1) / 2
+        self.centrality = [-(abs(s // columns - center_y) + abs(s % columns - center_x)) for s in range(self.squares)]
+
+    def from_board(self, board):
+        """Returns [X bits, O bits] for a list-of-lists board"""
+        bits = [0, 0]
+        for y in range(self.rows):
+            for x in range(self.columns):
+                if board[y][x] == tictactoe.X:
+                    bits[X_BITS] |= 1 << (y * self.columns + x)
+                elif board[y][x] == tictactoe.O:
+                    bits[O_BITS] |= 1 << (y * self.columns + x)
+        return bits
+
+    def to_board(self, bits):
+        """Returns the list-of-lists board for [X bits, O bits]"""
+        board = [[tictactoe.EMPTY] * self.columns for _ in range(self.rows)]
+        for square in range(self.squares):
+            if bits[X_BITS] & (1 << square):
+                board[square // self.columns][square % self.columns] = tictactoe.X
+            elif bits[O_BITS] & (1 << square):
+                board[square // self.columns][square % self.columns] = tictactoe.O
+        return board
+
+    def to_move(self, bits):
+        """Returns X_BITS or O_BITS for the side whose turn it is"""
+        return O_BITS if bits[X_BITS].bit_count() > bits[O_BITS].bit_count() else X_BITS
+
+    def wins_with(self, side_bits, square):
+        """Returns True if a stone on `square` completes a line of the given player's stones"""
+        for window in self.windows_through[square]:
+            if side_bits & window == window:
+                return True
+        return False
+
+    def winner(self, bits):
+        """Returns X_BITS or O_BITS if that player has a line, None otherwise"""
+        for side in (X_BITS, O_BITS):
+            if any(bits[side] & window == window for window in self.windows):
+                return side
+        return None
+
+    def candidates(self, bits):
+        """Returns the bitmask of squares worth trying as the next move"""
+        occupied = bits[X_BITS] | bits[O_BITS]
+        empty = self.full & ~occupied
+        if self.radius is None or not occupied:
+            return empty if occupied else (1 << (self.rows // 2 * self.columns + self.columns // 2))
+
+        # spread the stones `radius` times in all 8 directions
+        near = occupied
+        columns = self.columns
+        for _ in range(self.radius):
+            left = (near >> 1) & self.not_last_column
+            right = (near << 1) & self.not_first_column
+            near |= left | right
+            near |= (near >> columns) | (near << columns)
+            near &= self.full
+        return (near & empty) or empty
+
+    def evaluate(self, bits):
+        """Returns a heuristic score of the position for X
+
+        Each line still open to only one player counts 10 ** (that player's stones on it).
+        """
+        score = 0
+        for window in self.windows:
+            x = bits[X_BITS] & window
+            o = bits[O_BITS] & window
+            if x and not o:
+                score += 10 ** x.bit_count()
+            elif o and not x:
+                score -= 10 ** o.bit_count()
+        return score
+
+
+class Search():
+    """Iterative deepening alpha-beta search, keeping move ordering data between moves"""
+
+    def __init__(self, game):
+        self.game = game
+        self.history = [[0] * game.squares for _ in (X_BITS, O_BITS)]
+        self.killers = []
+        self.nodes = 0
+        self.deadline = None
+
+    def best_move(self, bits, budget=1.0, max_depth=None):
+        """Returns (square, score, depth) of the best move found within `budget` seconds
+
+        The score is from the point of view of the side to move. Each iteration searches one move
+        deeper, starting with the best move of the previous one. When time runs out, the unfinished
+        iteration is used only if it has already searched that move and found a better one.
+        """
+        side = self.game.to_move(bits)
+        moves = list(iterate_bits(self.game.candidates(bits)))
+        if not moves or self.game.winner(bits) is not None:
+            return None, 0, 0
+        if max_depth is None:
+            max_depth = self.game.full.bit_count() - (bits[X_BITS] | bits[O_BITS]).bit_count()
+        self.deadline = None if budget is None else time.perf_counter() + budget
+        self.nodes = 0
+
+        best = (moves[0], 0, 0)
+        for depth in range(1, max_depth + 1):
+            self.killers = [[None, None] for _ in range(depth + 1)]
+            moves.sort(key=lambda square: square != best[0])
+            iteration_best = None
+            alpha = -WIN - 1
+            try:
+                for square in moves:
+                    score = self.score_move(bits, side, square, depth, alpha, WIN + 1, 0)
+                    if iteration_best is None or score > iteration_best[1]:
+                        iteration_best = (square, score, depth)
+                        alpha = max(alpha, score)
+            except Timeout:
+                if iteration_best is not None and iteration_best[0] != best[0]:
+                    best = iteration_best
+                break
+            best = iteration_best
+
+            # a forced result will not change with more depth
+            if abs(best[1]) >= WIN - depth:
+                break
+        return best
+
+    def score_move(self, bits, side, square, depth, alpha, beta, ply):
+        """Returns the score for `side` of playing `square`, searched `depth` moves deep"""
+        bit = 1 << square
+        bits[side] |= bit
+        try:
+            if self.game.wins_with(bits[side], square):
+                return WIN - ply - 1
+            return -self.negamax(bits, 1 - side, depth - 1, -beta, -alpha, ply + 1)
+        finally:
+            bits[side] ^= bit
+
+    def search_root(self, bits, depth, moves):
+        """Returns (square, score) of the best of `moves`, each searched `depth` moves deep
+
+        Every move is searched with alpha one below the best score so far, so a move that ties it still
+        gets its exact score, and ties go to the move listed first. The result does not depend on the
+        order moves are searched in, which is what lets ParallelSearch agree with it.
+        """
+        side = self.game.to_move(bits)
+        self.killers = [[None, None] for _ in range(depth + 1)]
+        self.deadline = None
+        self.nodes = 0
+        best = (None, -WIN - 1)
+        for square in moves:
+            score = self.score_move(bits, side, square, depth, best[1] - 1, WIN + 1, 0)
+            if score > best[1]:
+                best = (square, score)
+        return best
+
+    def negamax(self, bits, side, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes % CLOCK_INTERVAL == 0 and time.perf_counter() > self.deadline:
+            raise Timeout
+
+        candidates = self.game.candidates(bits)
+        if not candidates:
+            return 0
+        if depth == 0:
+            score = self.game.evaluate(bits)
+            return score if side == X_BITS else -score
+
+        best_score = -WIN - 1
+        for square in self.ordered(candidates, side, ply):
+            score = self.score_move(bits, side, square, depth, alpha, beta, ply)
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                # remember moves that refute the opponent's choice
+                if square not in self.killers[ply]:
+                    self.killers[ply] = [square, self.killers[ply][0]]
+                self.history[side][square] += depth * depth
+                break
+        return best_score
+
+    def ordered(self, candidates, side, ply):
+        """Returns the candidate squares, killer moves first, then by history and centrality"""
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history[side]
+        centrality = self.game.centrality
+        return sorted(iterate_bits(candidates),
+                      key=lambda square: (square not in killers, -history[square], -centrality[square]))
+
+
+class ParallelSearch():
+    """Fixed-depth search with the root moves shared out to a pool of processes
+
+    Workers start each root move with alpha one below the best root score found so far, kept in shared
+    memory, so later moves are cut off as in the serial search. With split_depth=2 every reply to every
+    root move is a task of its own, which keeps more processes busy when there are few root moves. The
+    best reply found so far to each root move is shared too, as the alpha of its remaining replies.
+    """
+
+    def __init__(self, game, processes=None, split_depth=1):
+        self.game = game
+        self.split_depth = split_depth
+        self.shared_alpha = multiprocessing.Value("q", -WIN - 1)
+        self.shared_replies = multiprocessing.Array("q", game.squares)
+        self.pool = multiprocessing.Pool(processes, start_worker, (game, self.shared_alpha, self.shared_replies))
+        self.nodes = 0
+
+    def best_move(self, bits, depth):
+        """Returns (square, score, depth) like Search.best_move, and the same move as Search.search_root"""
+        moves = root_order(self.game, bits)
+        if not moves or self.game.winner(bits) is not None:
+            return None, 0, 0
+        side = self.game.to_move(bits)
+        self.shared_alpha.value = -WIN - 1
+        self.shared_replies[:] = [-WIN - 1] * self.game.squares
+        self.nodes = 0
+
+        # split the replies too, except to moves that end the game at once
+        scores = {}
+        replies = {}
+        tasks = []
+        for square in moves:
+            after = [bits[X_BITS], bits[O_BITS]]
+            after[side] |= 1 << square
+            if self.split_depth < 2 or depth < 2:
+                tasks.append((bits, square, None, depth))
+            elif self.game.wins_with(after[side], square):
+                scores[square] = WIN - 1
+            elif not self.game.candidates(after):
+                scores[square] = 0
+            else:
+                replies[square] = root_order(self.game, after)
+                tasks.extend((bits, square, reply, depth) for reply in replies[square])
+        if scores:
+            self.shared_alpha.value = max(scores.values())
+
+        # a root move is scored once all its replies are in, by the best of them for the opponent
+        best_replies = {}
+        for square, reply, score, nodes in self.pool.imap_unordered(search_task, tasks):
+            self.nodes += nodes
+            if reply is None:
+                scores[square] = score
+            else:
+                best_replies[square] = max(best_replies.get(square, -WIN - 1), score)
+                replies[square].remove(reply)
+                if replies[square]:
+                    continue
+                scores[square] = -best_replies[square]
+            if scores[square] > self.shared_alpha.value:
+                self.shared_alpha.value = scores[square]
+
+        best = max(moves, key=lambda square: (scores[square], -moves.index(square)))
+        return best, scores[best], depth
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+# Search of each worker process of a ParallelSearch, and the shared bounds it reads
+worker = {}
+
+
+def start_worker(game, shared_alpha, shared_replies):
+    worker["search"] = Search(game)
+    worker["alpha"] = shared_alpha
+    worker["replies"] = shared_replies
+
+
+def search_task(task):
+    """Returns (root, reply, score, nodes) for a root move, or for one reply to it if reply is not None
+
+    Root moves are scored for the side to move. Replies are scored for the opponent, with a window that
+    still gives the exact score of any root move that could tie the best one. A reply to a root move
+    that another reply has already refuted is not searched.
+    """
+    bits, root, reply, depth = task
+    search = worker["search"]
+    # killers carry over between tasks of the same search, as between sibling moves in Search
+    if len(search.killers) != depth + 1:
+        search.killers = [[None, None] for _ in range(depth + 1)]
+    search.nodes = 0
+    side = search.game.to_move(bits)
+    alpha = worker["alpha"].value
+    if reply is None:
+        score = search.score_move(bits, side, root, depth, alpha - 1, WIN + 1, 0)
+    else:
+        best_reply = worker["replies"][root]
+        if best_reply >= 1 - alpha:
+            return root, reply, best_reply, 0
+        bits[side] |= 1 << root
+        score = search.score_move(bits, 1 - side, reply, depth - 1, best_reply, 1 - alpha, 1)
+        with worker["replies"].get_lock():
+            worker["replies"][root] = max(worker["replies"][root], score)
+    return root, reply, score, search.nodes
+
+
+def root_order(game, bits):
+    """Returns the candidate moves in a fixed order, nearest the center first, so ties break the same way"""
+    return sorted(iterate_bits(game.candidates(bits)), key=lambda square: -game.centrality[square])
+
+
+def speedup_report(game, bits, depth, split_depth=1, max_processes=None):
+    """Prints the time of a serial search of the position and of parallel ones on 1 up to every core"""
+    search = Search(game)
+    start = time.perf_counter()
+    serial = search.search_root(bits, depth, root_order(game, bits))
+    serial_time = time.perf_counter() - start
+    print(f"    serial: {serial_time:.2f} s, {search.nodes} nodes, plays {divmod(serial[0], game.columns)}")
+
+    for processes in range(1, (max_processes or os.cpu_count()) + 1):
+        parallel = ParallelSearch(game, processes, split_depth)
+        start = time.perf_counter()
+        square, score = parallel.best_move(bits, depth)[:2]
+        elapsed = time.perf_counter() - start
+        parallel.close()
+        agrees = "same move" if (square, score) == serial else f"DIFFERENT: {divmod(square, game.columns)}"
+        print(f"{processes:>3} cores: {elapsed:.2f} s, {parallel.nodes} nodes, "
+              f"speedup {serial_time / elapsed:.2f}, {agrees}")
+
+
+def iterate_bits(mask):
+    """Yields the numbers of the bits set in mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def minimax(board, k=3, budget=1.0, radius=None):
+    """
+    Returns the best action found for the current player on a board of any size, like tictactoe.minimax.
+    """
+    game = Game(len(board), len(board[0]), k, radius)
+    square = Search(game).best_move(game.from_board(board), budget)[0]
+    if square is None:
+        return None
+    return square // game.columns, square % game.columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Let the engine play itself on an m,n,k board")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("columns", type=int)
+    parser.add_argument("k", type=int)
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per move")
+    parser.add_argument("--radius", type=int, default=None, help="only try moves this close to a stone")
+    parser.add_argument("--processes", type=int, default=None, help="search --depth moves deep on this many processes")
+    parser.add_argument("--depth", type=int, default=None, help="search depth for --processes and --report")
+    parser.add_argument("--split", type=int, choices=(1, 2), default=1, help="moves deep to split the search at")
+    parser.add_argument("--report", action="store_true",
+                        help="compare serial and parallel search on the position after the first move, and exit")
+    args = parser.parse_args()
+    if (args.processes or args.report) and args.depth is None:
+        parser.error("--processes and --report need --depth")
+
+    game = Game(args.rows, args.columns, args.k, args.radius)
+    if args.report:
+        first = next(iterate_bits(game.candidates([0, 0])))
+        speedup_report(game, [1 << first, 0], args.depth, args.split, args.processes)
+        return
+    search = ParallelSearch(game, args.processes, args.split) if args.processes else Search(game)
+    bits = [0, 0]
+    while game.winner(bits) is None and bits[X_BITS] | bits[O_BITS] != game.full:
+        side = game.to_move(bits)
+        if args.processes:
+            square, score, depth = search.best_move(bits, args.depth)
+        else:
+            square, score, depth = search.best_move(bits, args.budget)
+        bits[side] |= 1 << square
+        print(f"{'XO'[side]} plays {divmod(square, game.columns)} (depth {depth}, score {score}, "
+              f"{search.nodes} nodes)")
+    for row in game.to_board(bits):
+        print(" ".join(square or "." for square in row))
+    winner = game.winner(bits)
+    print("Draw." if winner is None else f"{'XO'[winner]} wins.")
+    if args.processes:
+        search.close()
+
+
+if __name__ == "__main__":
+    main()
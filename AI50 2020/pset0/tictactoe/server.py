@@ -0,0 +1,200 @@
+"""
+Tic Tac Toe server hosting many games against the AI at once
+
+Clients connect over TCP and send one command per line; every command gets one line of JSON back.
+
+    new [X|O]        start a game where the client plays X (the default) or O; returns its id
+    move ID I J      play square (I, J) in game ID; the AI answers in the same response
+    board ID         show game ID
+    stats            latency percentiles of AI moves and hit rates of the position caches
+    quit             close the connection, ending its games
+
+Searches run on a thread pool so the event loop keeps serving other games meanwhile. Threads rather
+than processes, so that every game shares the one position cache and tictactoe's transposition table.
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import tictactoe
+
+# Default number of positions whose best move is kept
+CACHE_SIZE = 4096
+
+# Number of recent AI moves the latency percentiles are taken over
+LATENCY_SAMPLES = 10000
+
+
+class GameService():
+    """
+    Game sessions, keyed by id, and the AI that plays them.
+
+    Best moves are cached by canonical position, so a move found in one game
+    answers every rotation and reflection of that position in all games.
+    """
+
+    def __init__(self, workers=None, cache_size=CACHE_SIZE):
+        self.executor = ThreadPoolExecutor(workers)
+        self.games = {}
+        self.ids = itertools.count(1)
+        self.canonical_move = functools.lru_cache(maxsize=cache_size)(self.search)
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.moves = 0
+
+    def search(self, encoding):
+        """Returns the square (3 * i + j) the AI plays on the canonical board with the given encoding"""
+        board = [[None if square == "." else square for square in encoding[y * 3:y * 3 + 3]] for y in range(3)]
+        y, x = tictactoe.minimax(board)
+        return 3 * y + x
+
+    def best_move(self, board):
+        encoding, symmetry = tictactoe.canonical(board)
+        return tictactoe.symmetries[symmetry][self.canonical_move(encoding)]
+
+    async def ai_move(self, game):
+        """Plays the AI's move in the game, searching on the thread pool"""
+        start = time.perf_counter()
+        move = await asyncio.get_running_loop().run_in_executor(self.executor, self.best_move, game["board"])
+        self.latencies.append(time.perf_counter() - start)
+        self.moves += 1
+        game["board"] = tictactoe.result(game["board"], move)
+        return move
+
+    async def new(self, owner, side="X"):
+        side = side.upper()
+        if side not in (tictactoe.X, tictactoe.O):
+            return {"error": "side must be X or O"}
+        game_id = next(self.ids)
+        game = self.games[game_id] = {"board": tictactoe.initial_state(), "human": side, "owner": owner}
+        reply = None
+        if side == tictactoe.O:
+            reply = await self.ai_move(game)
+        return dict(self.describe(game_id), reply=reply)
+
+    async def move(self, owner, game_id, i, j):
+        game = self.games.get(game_id)
+        if game is None or game["owner"] != owner:
+            return {"error": f"no game {game_id}"}
+        board = game["board"]
+        if tictactoe.terminal(board):
+            return {"error": "game is over"}
+        if (i, j) not in tictactoe.actions(board):
+            return {"error": f"({i}, {j}) is not an empty square"}
+
+        game["board"] = tictactoe.result(board, (i, j))
+        reply = None
+        if not tictactoe.terminal(game["board"]):
+            reply = await self.ai_move(game)
+        return dict(self.describe(game_id), reply=reply)
+
+    def describe(self, game_id):
+        board = self.games[game_id]["board"]
+        over = tictactoe.terminal(board)
+        return {
+            "game": game_id,
+            "board": ["".join(square or "." for square in row) for row in board],
+            "over": over,
+            "winner": tictactoe.winner(board) if over else None
+        }
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        info = self.canonical_move.cache_info()
+        lookups = info.hits + info.misses
+        search = tictactoe.search_stats
+        return {
+            "games": len(self.games),
+            "moves": self.moves,
+            "latency_ms": {
+                f"p{p}": round(latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000, 3)
+                for p in (50, 90, 99)
+            } if latencies else None,
+            "position_cache": {
+                "hits": info.hits,
+                "misses": info.misses,
+                "size": info.currsize,
+                "hit_rate": round(info.hits / lookups, 4) if lookups else None
+            },
+            "transpositions": {
+                "size": len(tictactoe.transpositions),
+                "hit_rate": round(search["hits"] / search["nodes"], 4) if search["nodes"] else None
+            },
+            "solved_table": tictactoe.perfect_play is not None
+        }
+
+    def close_games(self, owner):
+        for game_id in [game_id for game_id, game in self.games.items() if game["owner"] == owner]:
+            del self.games[game_id]
+
+    async def handle(self, owner, line):
+        """Returns the response to one command line"""
+        words = line.split()
+        if not words:
+            return {"error": "empty command"}
+        command, arguments = words[0].lower(), words[1:]
+        try:
+            if command == "new" and len(arguments) <= 1:
+                return await self.new(owner, *arguments)
+            if command == "move" and len(arguments) == 3:
+                return await self.move(owner, *(int(argument) for argument in arguments))
+            if command == "board" and len(arguments) == 1:
+                game_id = int(arguments[0])
+                if self.games.get(game_id, {}).get("owner") != owner:
+                    return {"error": f"no game {game_id}"}
+                return self.describe(game_id)
+            if command == "stats" and not arguments:
+                return self.stats()
+        except ValueError:
+            return {"error": "game ids and squares are numbers"}
+        return {"error": f"unknown command '{line.strip()}'"}
+
+
+async def serve_client(service, reader, writer):
+    owner = object()
+    try:
+        async for line in reader:
+            line = line.decode(errors="replace")
+            if line.strip().lower() == "quit":
+                break
+            response = await service.handle(owner, line)
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        service.close_games(owner)
+        writer.close()
+
+
+async def serve(service, port, host="127.0.0.1"):
+    """Serves clients until cancelled, each on its own task"""
+    server = await asyncio.start_server(functools.partial(serve_client, service), host, port)
+    print(f"Serving on {host}:{server.sockets[0].getsockname()[1]}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host Tic Tac Toe games against the AI")
+    parser.add_argument("--port", type=int, default=8060)
+    parser.add_argument("--workers", type=int, default=None, help="threads running searches")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="positions whose best move is kept")
+    args = parser.parse_args()
+
+    service = GameService(args.workers, args.cache_size)
+    try:
+        asyncio.run(serve(service, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
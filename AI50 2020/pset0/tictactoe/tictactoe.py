@@ -4,6 +4,9 @@ Tic Tac Toe Player
 
 import copy
 import math
+import os
+import sys
+from array import array
 
 X = "X"
 O = "O"
@@ -13,6 +16,42 @@ winning_shapes = [[(0, 0), (0, 1), (0, 2)], [(0, 0), (1, 0), (2, 0)], [(1, 0), (
                   [(0, 1), (1, 1), (2, 1)], [(2, 0), (2, 1), (2, 2)], [(0, 2), (1, 2), (2, 2)],
                   [(0, 0), (1, 1), (2, 2)], [(2, 0), (1, 1), (0, 2)]]
 
+# The 8 rotations and reflections of the board, each as a function of (row, column)
+symmetry_maps = [lambda y, x: (y, x), lambda y, x: (x, 2 - y), lambda y, x: (2 - y, 2 - x),
+                 lambda y, x: (2 - x, y), lambda y, x: (y, 2 - x), lambda y, x: (2 - y, x),
+                 lambda y, x: (x, y), lambda y, x: (2 - x, 2 - y)]
+
+# For each symmetry, the board square that ends up on each square of the transformed board
+symmetries = []
+for transform in symmetry_maps:
+    mapping = [None] * 9
+    for y in range(3):
+        for x in range(3):
+            new_y, new_x = transform(y, x)
+            mapping[new_y * 3 + new_x] = (y, x)
+    symmetries.append(mapping)
+
+# Kinds of values stored in the transposition table
+EXACT = 0
+LOWER_BOUND = 1  # the real value is at least the stored one
+UPPER_BOUND = 2  # the real value is at most the stored one
+
+# Positions searched by bestmove, keyed on the canonical encoding of the board
+# and holding (value, best move on the canonical board, kind of value)
+transpositions = {}
+
+# Number of positions bestmove was called on, and how many of those the table answered
+search_stats = {"nodes": 0, "hits": 0}
+
+# File holding the solved game, written by running `python tictactoe.py build`
+TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.table")
+
+# Solved game: one entry per board, indexed by position_index, or None if the table is not loaded.
+# Bits 0-8 of an entry mark the best squares (3 * i + j), bits 9-10 hold the value + 1,
+# and bit 11 is set for positions reachable in a game.
+perfect_play = None
+REACHABLE = 1 << 11
+
 
 def initial_state():
     """
@@ -119,12 +158,41 @@ def minimax(board):
     """
     if terminal(board):
         return None
+    if perfect_play is not None:
+        entry = perfect_play[position_index(board)]
+        if entry & REACHABLE:
+            # the first of the best squares
+            square = ((entry & 0x1ff) & -(entry & 0x1ff)).bit_length() - 1
+            return square // 3, square % 3
     best_move = bestmove(board, 0)[1]
     return best_move
 
 
+def canonical(board):
+    """Returns the encoding shared by all rotations and reflections of the board, and the symmetry giving it
+
+    The encoding is a string of 9 characters, the smallest among the 8 transformed boards.
+    """
+    encodings = []
+    for i, mapping in enumerate(symmetries):
+        encoding = "".join(board[y][x] or "." for y, x in mapping)
+        encodings.append((encoding, i))
+    return min(encodings)
+
+
 def bestmove(board, ups_best):
+    search_stats["nodes"] += 1
     who_plays = player(board)
+
+    # a stored value answers this call if it is exact, or if it would have been pruned anyway
+    key, symmetry = canonical(board)
+    if key in transpositions:
+        value, move, kind = transpositions[key]
+        if kind == EXACT or (kind == LOWER_BOUND and who_plays == X and value > ups_best) or \
+                (kind == UPPER_BOUND and who_plays == O and value < ups_best):
+            search_stats["hits"] += 1
+            return value, symmetries[symmetry][move]
+
     available_moves = actions(board)
 
     best_move = None  # best move found so far
@@ -147,12 +215,100 @@ def bestmove(board, ups_best):
 
             # pruning (act only when the best value changes)
             if (who_plays == X and best_value > ups_best) or (who_plays == O and best_value < ups_best):
+                # the remaining moves could only make the value better for the current player
+                store(key, symmetry, best_value, best_move, LOWER_BOUND if who_plays == X else UPPER_BOUND)
                 return best_value, best_move
 
     # the best value that the current player can achieve
+    store(key, symmetry, best_value, best_move, EXACT)
     return best_value, best_move
 
 
+def store(key, symmetry, value, move, kind):
+    # save the move as the square it lands on in the canonical board
+    transpositions[key] = (value, symmetries[symmetry].index(move), kind)
 
 
+def position_index(board):
+    """Returns the board read as a base-3 number, with squares worth 0 if empty, 1 for X and 2 for O"""
+    index = 0
+    for y in range(3):
+        for x in range(3):
+            index = index * 3 + (0 if board[y][x] == EMPTY else 1 if board[y][x] == X else 2)
+    return index
+
 
+def build_table():
+    """Solves every reachable position by backward induction and returns the perfect_play array
+
+    Positions are found by playing forward from the empty board, then solved from the fullest
+    boards back to the empty one, so the values of all replies are known when a position is solved.
+    """
+    positions = {position_index(initial_state()): initial_state()}
+    by_moves = [[] for _ in range(10)]
+    frontier = list(positions.values())
+    while frontier:
+        next_frontier = []
+        for board in frontier:
+            by_moves[9 - len(actions(board))].append(board)
+            if terminal(board):
+                continue
+            for action in actions(board):
+                child = result(board, action)
+                index = position_index(child)
+                if index not in positions:
+                    positions[index] = child
+                    next_frontier.append(child)
+        frontier = next_frontier
+
+    table = array("H", [0]) * 3 ** 9
+    values = {}
+    for boards in reversed(by_moves):
+        for board in boards:
+            index = position_index(board)
+            if terminal(board):
+                values[index] = utility(board)
+                table[index] = REACHABLE | (values[index] + 1) << 9
+                continue
+
+            outcomes = [(values[position_index(result(board, action))], action) for action in actions(board)]
+            best = max(v for v, _ in outcomes) if player(board) == X else min(v for v, _ in outcomes)
+            moves = 0
+            for value, (y, x) in outcomes:
+                if value == best:
+                    moves |= 1 << (3 * y + x)
+            values[index] = best
+            table[index] = REACHABLE | (best + 1) << 9 | moves
+    return table
+
+
+def save_table(table, filename=TABLE_FILE):
+    # the file is always little-endian
+    if sys.byteorder != "little":
+        table = array("H", table)
+        table.byteswap()
+    with open(filename, "wb") as f:
+        table.tofile(f)
+
+
+def load_table(filename=TABLE_FILE):
+    """Loads the solved game into perfect_play, if the file has been built"""
+    global perfect_play
+    if not os.path.exists(filename):
+        return
+    table = array("H")
+    with open(filename, "rb") as f:
+        table.fromfile(f, 3 ** 9)
+    if sys.byteorder != "little":
+        table.byteswap()
+    perfect_play = table
+
+
+load_table()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["build"]:
+        sys.exit("Usage: python tictactoe.py build")
+    save_table(build_table())
+    print(f"Wrote {TABLE_FILE}")
@@ -0,0 +1,141 @@
+"""
+Runs heredity on many family CSV files at once
+
+    python batch.py FAMILIES... [--method elimination] [--format jsonl|csv] [--processes N]
+
+FAMILIES are files, directories (every .csv file inside) or glob patterns. Each family is solved
+in a process pool and written to standard output as soon as it is done, as one JSON line or as
+CSV rows per person. A summary of throughput and the slowest families goes to standard error.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import elimination
+import heredity
+
+METHODS = {
+    "enumerate": heredity.enumerate_probabilities,
+    "stream": heredity.streamed_probabilities,
+    "vectorized": heredity.vectorized_probabilities,
+    "elimination": lambda people: elimination.infer(people, heredity.PROBS)
+}
+
+CSV_FIELDS = ["family", "person", "gene_2", "gene_1", "gene_0", "trait_true", "trait_false", "seconds", "error"]
+
+
+def family_files(patterns):
+    """Returns the sorted CSV files named by the arguments, without repeats"""
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.update(glob.glob(os.path.join(pattern, "*.csv")))
+        else:
+            files.update(glob.glob(pattern) or ([pattern] if os.path.isfile(pattern) else []))
+    return sorted(files)
+
+
+def solve(task):
+    """Returns the result of one family: its file, people, seconds and probabilities, or the error"""
+    path, method = task
+    start = time.perf_counter()
+    try:
+        people = heredity.load_data(path)
+        probabilities = METHODS[method](people)
+    except Exception as e:
+        return {"family": path, "error": f"{type(e).__name__}: {e}", "seconds": time.perf_counter() - start}
+    return {
+        "family": path,
+        "people": len(people),
+        "seconds": time.perf_counter() - start,
+        "probabilities": probabilities
+    }
+
+
+def jsonl_writer(out):
+    """Returns a function writing each result to `out` as one line of JSON"""
+    def write(result):
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+    return write
+
+
+def csv_writer(out):
+    """Returns a function writing each result to `out` as a CSV row per person, or one row with the error"""
+    writer = csv.DictWriter(out, CSV_FIELDS)
+    writer.writeheader()
+
+    def write(result):
+        if "error" in result:
+            writer.writerow({"family": result["family"], "seconds": result["seconds"], "error": result["error"]})
+            out.flush()
+            return
+        for person, distributions in result["probabilities"].items():
+            writer.writerow({
+                "family": result["family"],
+                "person": person,
+                "gene_2": distributions["gene"][2],
+                "gene_1": distributions["gene"][1],
+                "gene_0": distributions["gene"][0],
+                "trait_true": distributions["trait"][True],
+                "trait_false": distributions["trait"][False],
+                "seconds": result["seconds"]
+            })
+        out.flush()
+    return write
+
+
+def run(files, write, method="elimination", processes=None, slowest=5):
+    """
+    Solves every family file in a pool of processes, writing each result as it
+    comes in, and returns the summary printed at the end of a batch.
+    """
+    start = time.perf_counter()
+    timings = []
+    failures = 0
+    with multiprocessing.Pool(processes) as pool:
+        for result in pool.imap_unordered(solve, [(path, method) for path in files]):
+            write(result)
+            timings.append((result["seconds"], result["family"]))
+            failures += "error" in result
+
+    elapsed = time.perf_counter() - start
+    return {
+        "families": len(files),
+        "failures": failures,
+        "seconds": elapsed,
+        "families_per_second": len(files) / elapsed if elapsed else None,
+        "slowest": sorted(timings, reverse=True)[:slowest]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute gene and trait probabilities for many families")
+    parser.add_argument("families", nargs="+", help="CSV files, directories of them or glob patterns")
+    parser.add_argument("--method", choices=sorted(METHODS), default="elimination")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--processes", type=heredity.positive_int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--slowest", type=int, default=5, help="number of slowest families to list")
+    args = parser.parse_args()
+
+    files = family_files(args.families)
+    if not files:
+        sys.exit("No family files found.")
+    write = jsonl_writer(sys.stdout) if args.format == "jsonl" else csv_writer(sys.stdout)
+    summary = run(files, write, args.method, args.processes, args.slowest)
+
+    print(f"Solved {summary['families'] - summary['failures']} of {summary['families']} families "
+          f"in {summary['seconds']:.2f} s ({summary['families_per_second']:.1f} families/s)", file=sys.stderr)
+    for seconds, family in summary["slowest"]:
+        print(f"  {seconds:8.3f} s  {family}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Exact inference on a pedigree with a junction tree
+
+Every person's number of gene copies is a variable with values 0, 1 and 2. Known traits are
+evidence on those variables, and a person's trait distribution follows from their gene one.
+The tree comes from a min-fill elimination order, so the work grows with 3 ** (largest clique),
+the width of the pedigree, instead of with 6 ** (number of people) like enumeration.
+"""
+
+import heapq
+import time
+
+import numpy
+
+# Width of the last pedigree solved: the number of people in its largest clique
+elimination_stats = {"width": None}
+
+
+def inheritance_table(probs):
+    """Returns the (3, 3, 3) array of P(child's genes | mother's genes, father's genes), indexed [child, mother, father]"""
+    mutation = probs["mutation"]
+    # chance that a parent with 0, 1 or 2 copies passes one on
+    passes = numpy.array([mutation, 0.5, 1 - mutation])
+    keeps = 1 - passes
+    return numpy.array([
+        numpy.outer(keeps, keeps),
+        numpy.outer(passes, keeps) + numpy.outer(keeps, passes),
+        numpy.outer(passes, passes)
+    ])
+
+
+def trait_table(probs):
+    """Returns the (3, 2) array of P(trait | genes), indexed [genes, trait]"""
+    return numpy.array([[probs["trait"][genes][False], probs["trait"][genes][True]] for genes in range(3)])
+
+
+def evidence_vector(probs, trait):
+    """Returns how likely the known trait is for 0, 1 and 2 copies of the gene, or ones if it is unknown"""
+    if trait is None:
+        return numpy.ones(3)
+    return trait_table(probs)[:, int(trait)]
+
+
+def contract(operands, out):
+    """
+    Multiplies (scope, array) operands, where scope is a tuple of variables
+    naming the array's axes, and sums out every variable not in `out`.
+    """
+    labels = {}
+    arguments = []
+    for scope, array in operands:
+        arguments += [array, [labels.setdefault(v, len(labels)) for v in scope]]
+    arguments.append([labels.setdefault(v, len(labels)) for v in out])
+    return numpy.einsum(*arguments)
+
+
+def family_factors(people, probs):
+    """
+    Returns the names of the people, in order, and a (scope, array) factor per
+    person for their genes given their parents', with variables numbered by
+    that order. Like joint_probability, a parent missing from the CSV counts
+    as having no copies of the gene.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    inherit = inheritance_table(probs)
+    founder = numpy.array([probs["gene"][genes] for genes in range(3)])
+
+    factors = []
+    for i, name in enumerate(names):
+        mother, father = people[name]["mother"], people[name]["father"]
+        if not mother and not father:
+            factors.append(((i,), founder))
+            continue
+        table = inherit[:, 0 if mother not in index else slice(None), 0 if father not in index else slice(None)]
+        scope = (i,) + tuple(index[parent] for parent in (mother, father) if parent in index)
+        if len(set(scope)) < len(scope):
+            unique = tuple(dict.fromkeys(scope))
+            table, scope = contract([(scope, table)], unique), unique
+        factors.append((scope, table))
+    return names, factors
+
+
+def elimination_order(count, scopes):
+    """
+    Returns the elimination order of the variables 0..count-1 and the clique each one
+    is eliminated in, as a tuple starting with the variable, picking the variable
+    that adds the fewest edges to the moral graph each time.
+    """
+    neighbors = [set() for _ in range(count)]
+    for scope in scopes:
+        for v in scope:
+            neighbors[v].update(u for u in scope if u != v)
+
+    def fill_in(v):
+        others = list(neighbors[v])
+        return sum(1 for a in range(len(others)) for b in others[a + 1:] if b not in neighbors[others[a]])
+
+    # heap of (fill-in, degree, variable), where entries whose score has changed since are skipped
+    scores = {v: (fill_in(v), len(neighbors[v])) for v in range(count)}
+    heap = [score + (v,) for v, score in scores.items()]
+    heapq.heapify(heap)
+
+    order = []
+    cliques = []
+    while heap:
+        fill, degree, v = heapq.heappop(heap)
+        if scores.get(v) != (fill, degree):
+            continue
+        del scores[v]
+        cliques.append((v,) + tuple(sorted(neighbors[v])))
+        for u in neighbors[v]:
+            neighbors[u] |= neighbors[v] - {u}
+            neighbors[u].discard(v)
+        order.append(v)
+
+        # only the neighbors of v and their neighbors gained edges around them
+        changed = set(neighbors[v])
+        for u in neighbors[v]:
+            changed |= neighbors[u]
+        for u in changed:
+            score = (fill_in(u), len(neighbors[u]))
+            if score != scores[u]:
+                scores[u] = score
+                heapq.heappush(heap, score + (u,))
+    return order, cliques
+
+
+class JunctionTree():
+    """
+    Junction tree of a family, answering every person's gene and trait
+    distributions given the known traits with two passes of messages.
+
+    Clique k is the one variable order[k] is eliminated in. Its parent is the
+    clique of the next variable eliminated from it, and the separator between
+    them is the clique without order[k].
+    """
+
+    def __init__(self, people, probs):
+        self.probs = probs
+        self.names, factors = family_factors(people, probs)
+        self.traits = [people[name]["trait"] for name in self.names]
+        self.order, self.cliques = elimination_order(len(self.names), [scope for scope, _ in factors])
+        self.position = {v: k for k, v in enumerate(self.order)}
+
+        self.parent = [min((self.position[u] for u in clique[1:]), default=None) for clique in self.cliques]
+        self.children = [[] for _ in self.cliques]
+        for k, parent in enumerate(self.parent):
+            if parent is not None:
+                self.children[parent].append(k)
+
+        # each factor goes to the clique of its first eliminated variable, which holds its whole scope
+        self.factors = [[] for _ in self.cliques]
+        for scope, table in factors:
+            self.factors[min(self.position[v] for v in scope)].append((scope, table))
+        self.evidence = [evidence_vector(probs, trait) for trait in self.traits]
+        self.potentials = [self.potential(k) for k in range(len(self.cliques))]
+
+        self.up = [None] * len(self.cliques)
+        self.down = [None] * len(self.cliques)
+        self.messages = 0
+
+    def potential(self, k):
+        """Returns the product of clique k's factors and the evidence on its variable, over the whole clique"""
+        v = self.order[k]
+        clique = self.cliques[k]
+        return contract([(clique, numpy.ones((3,) * len(clique)))] + self.factors[k] + [((v,), self.evidence[v])],
+                        clique)
+
+    def separator(self, k):
+        return self.cliques[k][1:]
+
+    def send_up(self, k):
+        """Computes the message from clique k to its parent, summing out its variable"""
+        operands = [(self.cliques[k], self.potentials[k])] + [(self.separator(c), self.up[c]) for c in self.children[k]]
+        self.up[k] = normalized(contract(operands, self.separator(k)))
+        self.messages += 1
+
+    def send_down(self, k):
+        """Computes the message from clique k's parent to k, from everything outside k's subtree"""
+        parent = self.parent[k]
+        operands = [(self.cliques[parent], self.potentials[parent])]
+        operands += [(self.separator(c), self.up[c]) for c in self.children[parent] if c != k]
+        if self.parent[parent] is not None:
+            operands.append((self.separator(parent), self.down[parent]))
+        self.down[k] = normalized(contract(operands, self.separator(k)))
+        self.messages += 1
+
+    def calibrate(self):
+        """Sends every message, children before parents and then parents before children"""
+        for k in range(len(self.cliques)):
+            if self.parent[k] is not None:
+                self.send_up(k)
+        for k in reversed(range(len(self.cliques))):
+            if self.parent[k] is not None:
+                self.send_down(k)
+
+    def gene_distribution(self, v):
+        """Returns the array of P(genes of person v = 0, 1, 2 | evidence)"""
+        k = self.position[v]
+        operands = [(self.cliques[k], self.potentials[k])] + [(self.separator(c), self.up[c]) for c in self.children[k]]
+        if self.parent[k] is not None:
+            operands.append((self.separator(k), self.down[k]))
+        return normalized(contract(operands, (v,)))
+
+    def person_probabilities(self, v):
+        """Returns person v's entry of heredity's `probabilities` dictionary"""
+        genes = self.gene_distribution(v)
+        if self.traits[v] is None:
+            trait = genes @ trait_table(self.probs)
+        else:
+            trait = numpy.array([0.0, 1.0]) if self.traits[v] else numpy.array([1.0, 0.0])
+        return {
+            "gene": {2: float(genes[2]), 1: float(genes[1]), 0: float(genes[0])},
+            "trait": {True: float(trait[1]), False: float(trait[0])}
+        }
+
+    def probabilities(self):
+        """Returns the distributions in the form of heredity's `probabilities` dictionary"""
+        return {name: self.person_probabilities(v) for v, name in enumerate(self.names)}
+
+    def width(self):
+        """Returns the number of variables in the largest clique, or 0 for an empty family"""
+        return max((len(clique) for clique in self.cliques), default=0)
+
+
+class Session():
+    """
+    A family loaded once, whose `probabilities` are kept up to date as known
+    traits change, resending only the messages that depend on the change.
+
+    A trait is evidence in the clique of its person. Messages towards the root
+    of that clique's tree change along the path from the clique to the root,
+    and messages away from the root change everywhere in that tree except into
+    the cliques on the path. Other trees, for unrelated people, are untouched.
+    """
+
+    def __init__(self, people, probs):
+        start = time.perf_counter()
+        self.tree = JunctionTree(people, probs)
+        self.tree.calibrate()
+        elimination_stats["width"] = self.tree.width()
+        self.probabilities = self.tree.probabilities()
+        self.full_seconds = time.perf_counter() - start
+        self.full_messages = self.tree.messages
+        self.index = {name: v for v, name in enumerate(self.tree.names)}
+
+        # root of each clique's tree; parents come later in the elimination order
+        tree = self.tree
+        self.roots = [None] * len(tree.cliques)
+        for k in reversed(range(len(tree.cliques))):
+            self.roots[k] = k if tree.parent[k] is None else self.roots[tree.parent[k]]
+
+        # cost of the last set_trait next to that of computing everything again
+        self.update_stats = {}
+
+    def set_trait(self, name, trait):
+        """Sets a person's known trait (True, False or None for unknown) and updates `probabilities`"""
+        start = time.perf_counter()
+        tree = self.tree
+        v = self.index[name]
+        k = tree.position[v]
+        messages = tree.messages
+        tree.traits[v] = trait
+        tree.evidence[v] = evidence_vector(tree.probs, trait)
+        tree.potentials[k] = tree.potential(k)
+
+        path = [k]
+        while tree.parent[path[-1]] is not None:
+            path.append(tree.parent[path[-1]])
+        for j in path[:-1]:
+            tree.send_up(j)
+        on_path = set(path)
+        component = [j for j in reversed(range(len(tree.cliques))) if self.roots[j] == self.roots[k]]
+        for j in component:
+            if j not in on_path:
+                tree.send_down(j)
+
+        for j in component:
+            person = tree.order[j]
+            self.probabilities[tree.names[person]] = tree.person_probabilities(person)
+
+        self.update_stats = {
+            "messages": tree.messages - messages,
+            "full_messages": self.full_messages,
+            "people": len(component),
+            "seconds": time.perf_counter() - start,
+            "full_seconds": self.full_seconds
+        }
+
+
+def normalized(array):
+    # messages are rescaled to sum to 1 so long pedigrees do not underflow
+    return array / array.sum()
+
+
+def infer(people, probs):
+    """
+    Returns the normalized gene and trait distributions of everyone in the family,
+    like heredity's enumeration does.
+    """
+    tree = JunctionTree(people, probs)
+    tree.calibrate()
+    elimination_stats["width"] = tree.width()
+    return tree.probabilities()
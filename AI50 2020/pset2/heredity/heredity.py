@@ -1,8 +1,12 @@
+import argparse
 import csv
 import itertools
 import sys
 import numpy
 
+import elimination
+import sampling
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -37,13 +41,109 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Number of assignments whose joint probabilities are computed at once by the vectorized method
+BLOCK_SIZE = 1 << 16
+
+# Complete assignments of genes and traits the streaming method multiplied out, and how many
+# it never reached because a partial assignment contradicted a known trait or fell to the threshold
+stream_stats = {"evaluated": 0, "skipped": 0}
+
 
 def main():
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Compute gene and trait probabilities for a family")
+    parser.add_argument("data", help="CSV file of the family")
+    parser.add_argument("--method",
+                        choices=("enumerate", "stream", "vectorized", "elimination", "likelihood", "gibbs"),
+                        default="enumerate",
+                        help="sum over every assignment, one at a time, pruned while they are generated "
+                             "or in blocks of arrays, eliminate variables on a junction tree, or estimate "
+                             "by likelihood weighting or Gibbs sampling")
+    parser.add_argument("--change", action="append", default=[], metavar="NAME=TRAIT",
+                        help="after solving by elimination, set a person's trait to 1, 0 or unknown (blank) "
+                             "and update the results incrementally; may be repeated")
+    parser.add_argument("--prune-below", type=float, default=0,
+                        help="let stream drop partial assignments this unlikely (0 keeps the result exact)")
+    parser.add_argument("--samples", type=positive_int, default=10000, help="sample budget of likelihood and gibbs")
+    parser.add_argument("--processes", type=positive_int, default=1, help="processes to split the samples over")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the samplers")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    # Sampling also gives a 95% confidence interval for every probability
+    intervals = None
+    if args.method in ("likelihood", "gibbs"):
+        probabilities, intervals = sampling.sample(people, PROBS, args.method, args.samples, args.processes,
+                                                   args.seed)
+        if args.method == "likelihood" and sampling.sample_stats["effective_samples"] < 100:
+            print(f"Warning: only {sampling.sample_stats['effective_samples']:.1f} effective samples, "
+                  "intervals are unreliable; try --method gibbs", file=sys.stderr)
+    elif args.method == "elimination" and args.change:
+        probabilities = apply_changes(people, args.change)
+    elif args.method == "elimination":
+        probabilities = elimination.infer(people, PROBS)
+    elif args.method == "vectorized":
+        probabilities = vectorized_probabilities(people)
+    elif args.method == "stream":
+        probabilities = streamed_probabilities(people, args.prune_below)
+    else:
+        probabilities = enumerate_probabilities(people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if intervals is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    low, high = intervals[person][field][value]
+                    print(f"    {value}: {p:.4f} ({low:.4f} - {high:.4f})")
+    if args.change and args.method != "elimination":
+        print("--change is only applied with --method elimination", file=sys.stderr)
+    if args.method == "stream":
+        print(f"Evaluated {stream_stats['evaluated']} assignments, skipped {stream_stats['skipped']}")
+    if args.method == "elimination":
+        width = elimination.elimination_stats["width"]
+        print(f"Largest clique holds {width} people, {3 ** width} gene assignments")
+
+
+def positive_int(text):
+    """
+    Return the integer in `text`, for counts that must be at least 1.
+    """
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a number of at least 1, got {value}")
+    return value
+
+
+def apply_changes(people, changes):
+    """
+    Solve the family by elimination, then apply each NAME=TRAIT change to its known
+    traits with an incremental update, printing what each update cost.
+    Return the probabilities after the last change.
+    """
+    session = elimination.Session(people, PROBS)
+    for change in changes:
+        name, _, value = change.partition("=")
+        if name not in people or value not in ("1", "0", ""):
+            sys.exit(f"Invalid change '{change}': expected NAME=1, NAME=0 or NAME=")
+        session.set_trait(name, True if value == "1" else False if value == "0" else None)
+        stats = session.update_stats
+        print(f"Set {name}'s trait to {value or 'unknown'}: resent {stats['messages']} of "
+              f"{stats['full_messages']} messages in {stats['seconds'] * 1000:.2f} ms "
+              f"(solving from scratch took {stats['full_seconds'] * 1000:.2f} ms)")
+    return session.probabilities
+
+
+def enumerate_probabilities(people):
+    """
+    Return the normalized gene and trait distributions of everyone in `people`,
+    summing the joint probability of every assignment that fits the known traits.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -84,15 +184,7 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -166,22 +258,7 @@ def joint_probability(people, one_gene, two_genes, have_trait):
             # number of target genes for parents
             mother_genes = genes_count(people[person]['mother'], one_gene, two_genes)
             father_genes = genes_count(people[person]['father'], one_gene, two_genes)
-
-            def chance_will_inherit(parent_genes, inherit):
-                # returns the chance of inheriting (or not) the gene from parent with given number of it
-                if inherit:
-                    return (parent_genes * 0.5) + (1 - parent_genes) * PROBS["mutation"]
-                else:
-                    return 1 - (parent_genes * 0.5) + (parent_genes - 1) * PROBS["mutation"]
-
-            if genes == 0:
-                gene_prob = chance_will_inherit(mother_genes, False) * chance_will_inherit(father_genes, False)
-            if genes == 1:
-                from_mother = chance_will_inherit(mother_genes, True) * chance_will_inherit(father_genes, False)
-                from_father = chance_will_inherit(mother_genes, False) * chance_will_inherit(father_genes, True)
-                gene_prob = from_father + from_mother
-            if genes == 2:
-                gene_prob = chance_will_inherit(mother_genes, True) * chance_will_inherit(father_genes, True)
+            gene_prob = inherited_gene_probability(genes, mother_genes, father_genes)
 
         trait_prob = PROBS["trait"][genes][trait]
         # add the probability that a person has attributes indicated by arguments
@@ -190,6 +267,177 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     return numpy.prod(person_probs)
 
 
+def chance_will_inherit(parent_genes, inherit):
+    # returns the chance of inheriting (or not) the gene from parent with given number of it
+    if inherit:
+        return (parent_genes * 0.5) + (1 - parent_genes) * PROBS["mutation"]
+    else:
+        return 1 - (parent_genes * 0.5) + (parent_genes - 1) * PROBS["mutation"]
+
+
+def inherited_gene_probability(genes, mother_genes, father_genes):
+    # chance of a child having `genes` copies given how many each parent has
+    if genes == 0:
+        return chance_will_inherit(mother_genes, False) * chance_will_inherit(father_genes, False)
+    if genes == 1:
+        from_mother = chance_will_inherit(mother_genes, True) * chance_will_inherit(father_genes, False)
+        from_father = chance_will_inherit(mother_genes, False) * chance_will_inherit(father_genes, True)
+        return from_father + from_mother
+    return chance_will_inherit(mother_genes, True) * chance_will_inherit(father_genes, True)
+
+
+def person_table(person, people):
+    """
+    Return a (3, 3, 3, 2) array of the factor joint_probability multiplies in for `person`,
+    indexed by their genes, their mother's and father's genes, and whether they have the trait.
+    The entries are computed exactly as joint_probability computes them.
+    """
+    table = numpy.empty((3, 3, 3, 2))
+    founder = not people[person]['mother'] and not people[person]['father']
+    for genes, mother_genes, father_genes, trait in itertools.product(range(3), range(3), range(3), (0, 1)):
+        if founder:
+            gene_prob = PROBS["gene"][genes]
+        else:
+            gene_prob = inherited_gene_probability(genes, mother_genes, father_genes)
+        table[genes, mother_genes, father_genes, trait] = PROBS["trait"][genes][bool(trait)] * gene_prob
+    return table
+
+
+def vectorized_probabilities(people, block_size=BLOCK_SIZE):
+    """
+    Return the same distributions as enumerate_probabilities, computing the joint
+    probabilities of `block_size` assignments at a time with array operations.
+
+    Assignment number a gives person i (in the order of `people`) digit i of a in base 3
+    as their genes, and the following bits of a as the traits of the people whose trait
+    is unknown, so only assignments fitting the known traits are generated.
+    """
+    names = list(people)
+    count = len(names)
+    index = {name: i for i, name in enumerate(names)}
+    tables = numpy.array([person_table(person, people) for person in names])
+    unknown = [i for i, person in enumerate(names) if people[person]["trait"] is None]
+    known = numpy.array([int(bool(people[person]["trait"])) for person in names], dtype=numpy.int8)
+
+    # a parent missing from the file reads the genes column of zeros at index `count`
+    mothers = numpy.array([index.get(people[person]["mother"], count) for person in names])
+    fathers = numpy.array([index.get(people[person]["father"], count) for person in names])
+
+    gene_sums = numpy.zeros((count, 3))
+    trait_sums = numpy.zeros((count, 2))
+    total = 3 ** count * 2 ** len(unknown)
+    powers = 3 ** numpy.arange(count, dtype=numpy.int64)
+    for start in range(0, total, block_size):
+        assignments = numpy.arange(start, min(start + block_size, total), dtype=numpy.int64)
+
+        # decode every assignment into a row of gene counts and a row of traits
+        genes = numpy.zeros((len(assignments), count + 1), dtype=numpy.int8)
+        genes[:, :count] = assignments[:, None] // powers % 3
+        traits = numpy.tile(known, (len(assignments), 1))
+        traits[:, unknown] = assignments[:, None] // 3 ** count >> numpy.arange(len(unknown)) & 1
+
+        # each person's factor, multiplied across people in order as numpy.prod does
+        factors = tables[numpy.arange(count), genes[:, :count], genes[:, mothers], genes[:, fathers], traits]
+        p = numpy.prod(factors, axis=1)
+
+        for i in range(count):
+            gene_sums[i] += numpy.bincount(genes[:, i], weights=p, minlength=3)
+            trait_sums[i] += numpy.bincount(traits[:, i], weights=p, minlength=2)
+
+    probabilities = {
+        person: {
+            "gene": {2: float(gene_sums[i, 2]), 1: float(gene_sums[i, 1]), 0: float(gene_sums[i, 0])},
+            "trait": {True: float(trait_sums[i, 1]), False: float(trait_sums[i, 0])}
+        }
+        for i, person in enumerate(names)
+    }
+    normalize(probabilities)
+    return probabilities
+
+
+def parents_first(people):
+    """
+    Return the people in an order where everyone comes after the parents of theirs in `people`.
+    """
+    order = []
+    placed = set()
+
+    def place(person):
+        if person in placed:
+            return
+        placed.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent in people:
+                place(parent)
+        order.append(person)
+
+    for person in people:
+        place(person)
+    return order
+
+
+def stream_assignments(people, threshold=0):
+    """
+    Yield (genes, traits, p) for every assignment of genes and traits that fits the
+    known traits, with `genes` and `traits` dictionaries of each person's values
+    (reused between assignments) and p their joint probability.
+
+    People are assigned one at a time, parents first, multiplying in each person's
+    factor as they go. A known trait is only ever given its known value, and a partial
+    assignment whose probability is at most `threshold` is dropped with every way
+    of completing it. Both count towards stream_stats["skipped"].
+    """
+    order = parents_first(people)
+    tables = {person: person_table(person, people).tolist() for person in order}
+    genes = {}
+    traits = {}
+
+    def extend(depth, p):
+        if depth == len(order):
+            stream_stats["evaluated"] += 1
+            yield genes, traits, p
+            return
+
+        person = order[depth]
+        table = tables[person]
+        known = people[person]["trait"]
+        # a parent not in the file has no copies, as in joint_probability
+        mother_genes = genes.get(people[person]["mother"], 0)
+        father_genes = genes.get(people[person]["father"], 0)
+        completions = 6 ** (len(order) - depth - 1)
+        for person_genes in (0, 1, 2):
+            for trait in (False, True):
+                q = p * table[person_genes][mother_genes][father_genes][trait]
+                if (known is not None and trait != known) or q <= threshold:
+                    stream_stats["skipped"] += completions
+                    continue
+                genes[person] = person_genes
+                traits[person] = trait
+                yield from extend(depth + 1, q)
+        genes.pop(person, None)
+        traits.pop(person, None)
+
+    return extend(0, 1.0)
+
+
+def streamed_probabilities(people, threshold=0):
+    """
+    Return the same distributions as enumerate_probabilities, summing over
+    stream_assignments instead of building powersets.
+    """
+    stream_stats["evaluated"] = stream_stats["skipped"] = 0
+    probabilities = {
+        person: {"gene": {2: 0, 1: 0, 0: 0}, "trait": {True: 0, False: 0}}
+        for person in people
+    }
+    for genes, traits, p in stream_assignments(people, threshold):
+        for person in people:
+            probabilities[person]["gene"][genes[person]] += p
+            probabilities[person]["trait"][traits[person]] += p
+    normalize(probabilities)
+    return probabilities
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
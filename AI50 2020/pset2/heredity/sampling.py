@@ -0,0 +1,243 @@
+"""
+Approximate inference on large pedigrees by sampling
+
+Both samplers draw gene counts for everyone and condition on the known traits. Likelihood
+weighting samples genes from parents to children and weights each sample by how likely the known
+traits are. Gibbs sampling runs chains that redraw one person's genes at a time given everyone
+else's. Unknown traits are estimated from P(trait | sampled genes) rather than by sampling them,
+which gives the same expectation with less noise.
+
+Every estimate comes with a 95% confidence interval.
+"""
+
+import concurrent.futures
+import math
+
+import numpy
+
+import elimination
+
+# z-score of the reported confidence intervals
+Z = 1.96
+
+# Chains each Gibbs worker runs side by side
+CHAINS = 32
+
+# Share of each Gibbs chain thrown away before it is counted
+BURN_IN = 0.2
+
+# Largest number of values held per batch of likelihood weighting samples
+BATCH_VALUES = 1 << 20
+
+# Effective number of samples behind the last estimate: the Kish effective sample size of
+# the weights for likelihood weighting, which is far below the budget when the evidence is
+# unlikely and then makes its intervals unreliable, and the number of chains for Gibbs
+sample_stats = {"effective_samples": None}
+
+
+class Pedigree():
+    """
+    Tables and parent links of a family, with people numbered in the order of
+    `people` and genes kept in an (S, n + 1) array whose last column is always
+    0, standing for a parent missing from the file, as in joint_probability.
+    """
+
+    def __init__(self, people, probs):
+        self.names = list(people)
+        count = len(self.names)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.count = count
+        self.founders = [not people[name]["mother"] and not people[name]["father"] for name in self.names]
+        self.mothers = [index.get(people[name]["mother"], count) for name in self.names]
+        self.fathers = [index.get(people[name]["father"], count) for name in self.names]
+        self.traits = [people[name]["trait"] for name in self.names]
+
+        self.prior = numpy.array([probs["gene"][genes] for genes in range(3)])
+        self.inherit = elimination.inheritance_table(probs)
+        self.trait_given_genes = elimination.trait_table(probs)[:, 1]
+        self.evidence = numpy.array([elimination.evidence_vector(probs, trait) for trait in self.traits])
+
+        self.children = [[] for _ in range(count)]
+        for i in range(count):
+            if not self.founders[i]:
+                for parent in {self.mothers[i], self.fathers[i]} - {count}:
+                    self.children[parent].append(i)
+
+        # parents before children, so likelihood weighting can sample in this order
+        self.order = []
+        placed = set()
+        for i in range(count):
+            stack = [i]
+            while stack:
+                person = stack[-1]
+                if person in placed:
+                    stack.pop()
+                    continue
+                parents = [] if self.founders[person] else [self.mothers[person], self.fathers[person]]
+                waiting = [p for p in parents if p != count and p not in placed and p not in stack]
+                if waiting:
+                    stack.extend(waiting)
+                else:
+                    placed.add(person)
+                    self.order.append(person)
+                    stack.pop()
+
+    def gene_probabilities(self, i, genes):
+        """Returns the (S, 3) array of P(genes of person i | their parents' genes) for each sample"""
+        if self.founders[i]:
+            return numpy.broadcast_to(self.prior, (len(genes), 3))
+        return self.inherit[:, genes[:, self.mothers[i]], genes[:, self.fathers[i]]].T
+
+    def values(self, genes):
+        """Returns the (S, n, 4) array each sample contributes: its genes as 0, 1, 2 indicators and P(trait)"""
+        genes = genes[:, :self.count]
+        return numpy.concatenate([genes[:, :, None] == numpy.arange(3), self.trait_given_genes[genes][:, :, None]],
+                                 axis=2)
+
+
+def draw(rng, probabilities):
+    """Returns one value per row of an (S, k) array of probabilities, which need not be normalized"""
+    cumulative = numpy.cumsum(probabilities, axis=1)
+    return (rng.random(len(probabilities))[:, None] * cumulative[:, -1:] >= cumulative).sum(axis=1).astype(numpy.int8)
+
+
+def likelihood_weighting(pedigree, samples, seed):
+    """
+    Returns (log scale, sums) of weighted samples for combine_weighted: the sums of
+    w, w * value, w ** 2, w ** 2 * value and w ** 2 * value ** 2 over the samples,
+    with weights divided by exp(log scale) so they cannot overflow or underflow.
+    """
+    rng = numpy.random.default_rng(seed)
+    batch = max(1, BATCH_VALUES // (4 * pedigree.count))
+    scale, sums = -math.inf, None
+    for start in range(0, samples, batch):
+        size = min(batch, samples - start)
+        genes = numpy.zeros((size, pedigree.count + 1), dtype=numpy.int8)
+        log_weights = numpy.zeros(size)
+        for i in pedigree.order:
+            genes[:, i] = draw(rng, pedigree.gene_probabilities(i, genes))
+            if pedigree.traits[i] is not None:
+                log_weights += numpy.log(pedigree.evidence[i][genes[:, i]])
+
+        values = pedigree.values(genes)
+        batch_scale = log_weights.max()
+        w = numpy.exp(log_weights - batch_scale)[:, None, None]
+        batch_sums = [w.sum(), (w * values).sum(axis=0), (w ** 2).sum(), (w ** 2 * values).sum(axis=0),
+                      (w ** 2 * values ** 2).sum(axis=0)]
+        scale, sums = merge_weighted((scale, sums), (batch_scale, batch_sums))
+    return scale, sums
+
+
+def merge_weighted(first, second):
+    """
+    Adds two (log scale, sums) of likelihood_weighting, rescaling both to the larger scale.
+    A part without samples has sums None and leaves the other part as it is.
+    """
+    if first[1] is None:
+        return second
+    if second[1] is None:
+        return first
+    scale = max(first[0], second[0])
+    merged = [0] * 5
+    for part_scale, sums in (first, second):
+        factor = math.exp(part_scale - scale)
+        for k in range(5):
+            # the last three sums hold squared weights
+            merged[k] = merged[k] + sums[k] * (factor if k < 2 else factor ** 2)
+    return scale, merged
+
+
+def combine_weighted(parts):
+    """Returns the (n, 4) estimates and standard errors of the ratio estimator from likelihood_weighting parts"""
+    scale, sums = (-math.inf, None)
+    for part in parts:
+        scale, sums = merge_weighted((scale, sums), part)
+    weights, weighted, squares, squared, squared_values = sums
+    sample_stats["effective_samples"] = float(weights ** 2 / squares)
+    mean = weighted / weights
+    variance = (squared_values - 2 * mean * squared + mean ** 2 * squares) / weights ** 2
+    return mean, numpy.sqrt(numpy.maximum(variance, 0))
+
+
+def gibbs(pedigree, samples, seed, chains=CHAINS):
+    """
+    Runs `chains` Gibbs chains side by side until they have drawn about `samples`
+    states in all, and returns the (chains, n, 4) array of each chain's mean value.
+    The chains start from samples of the genes given only the parents.
+    """
+    rng = numpy.random.default_rng(seed)
+    sweeps = max(2, math.ceil(samples / chains))
+    burn_in = int(sweeps * BURN_IN)
+
+    genes = numpy.zeros((chains, pedigree.count + 1), dtype=numpy.int8)
+    for i in pedigree.order:
+        genes[:, i] = draw(rng, pedigree.gene_probabilities(i, genes))
+
+    rows = numpy.arange(chains)
+    totals = numpy.zeros((chains, pedigree.count, 4))
+    for sweep in range(sweeps):
+        for i in pedigree.order:
+            # P(genes of i | everyone else) grows with i's own factor, the evidence and the children's factors
+            conditional = numpy.empty((chains, 3))
+            for value in range(3):
+                genes[:, i] = value
+                p = pedigree.gene_probabilities(i, genes)[:, value] * pedigree.evidence[i][value]
+                for child in pedigree.children[i]:
+                    p = p * pedigree.gene_probabilities(child, genes)[rows, genes[:, child]]
+                conditional[:, value] = p
+            genes[:, i] = draw(rng, conditional)
+        if sweep >= burn_in:
+            totals += pedigree.values(genes)
+    return totals / (sweeps - burn_in)
+
+
+def sample(people, probs, method="likelihood", samples=10000, processes=1, seed=None):
+    """
+    Returns (probabilities, intervals) estimated from `samples` samples in all,
+    split over `processes` processes. `probabilities` is in the form of heredity's
+    dictionary and `intervals` holds a (low, high) 95% interval for each of its values.
+
+    Likelihood weighting intervals come from the variance of the weighted mean,
+    and Gibbs intervals from the spread of the means of independent chains.
+    """
+    if samples < 1:
+        raise ValueError("samples must be at least 1")
+    pedigree = Pedigree(people, probs)
+    # every process gets at least one sample
+    processes = min(processes, samples)
+    seeds = numpy.random.SeedSequence(seed).spawn(processes)
+    shares = [samples // processes + (k < samples % processes) for k in range(processes)]
+    worker = likelihood_weighting if method == "likelihood" else gibbs
+
+    if processes == 1:
+        parts = [worker(pedigree, shares[0], seeds[0])]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            parts = list(executor.map(worker, [pedigree] * processes, shares, seeds))
+
+    if method == "likelihood":
+        mean, error = combine_weighted(parts)
+    else:
+        chain_means = numpy.concatenate(parts)
+        sample_stats["effective_samples"] = len(chain_means)
+        mean = chain_means.mean(axis=0)
+        error = chain_means.std(axis=0, ddof=1) / math.sqrt(len(chain_means))
+
+    probabilities = {}
+    intervals = {}
+    for i, name in enumerate(pedigree.names):
+        low = numpy.clip(mean[i] - Z * error[i], 0, 1)
+        high = numpy.clip(mean[i] + Z * error[i], 0, 1)
+        probabilities[name] = {
+            "gene": {genes: float(mean[i, genes]) for genes in (2, 1, 0)},
+            "trait": {True: float(mean[i, 3]), False: float(1 - mean[i, 3])}
+        }
+        intervals[name] = {
+            "gene": {genes: (float(low[genes]), float(high[genes])) for genes in (2, 1, 0)},
+            "trait": {True: (float(low[3]), float(high[3])), False: (float(1 - high[3]), float(1 - low[3]))}
+        }
+        if pedigree.traits[i] is not None:
+            known = pedigree.traits[i]
+            probabilities[name]["trait"] = {True: float(known), False: float(not known)}
+            intervals[name]["trait"] = {True: (float(known),) * 2, False: (float(not known),) * 2}
+    return probabilities, intervals
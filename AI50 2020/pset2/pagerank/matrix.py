@@ -0,0 +1,148 @@
+"""
+PageRank on a corpus stored as a sparse link matrix
+
+Pages are numbered in sorted order and their links kept as compressed sparse rows in NumPy
+arrays, so a step of power iteration, or of thousands of random surfers, is a few array
+operations at once.
+"""
+
+import concurrent.futures
+import itertools
+import math
+
+import numpy
+
+# Default L1 distance between two iterations below which ranks count as converged
+TOLERANCE = 1e-6
+
+# Default largest number of iterations
+MAX_ITERATIONS = 1000
+
+# Default number of random surfers advanced together
+WALKERS = 4096
+
+# Steps whose positions are kept before they are added to the visit counts
+COUNT_EVERY = 64
+
+# Steps each surfer takes before its visits count. Surfers start on random pages, and the
+# share of their visits still following that start shrinks like damping ** steps (0.85 ** 50 < 0.0003)
+BURN_IN = 50
+
+
+class LinkMatrix():
+    """
+    Links of a corpus as compressed sparse rows: page p links to the pages
+    indices[indptr[p]:indptr[p + 1]], and sources holds p for each of those
+    entries. Pages without links are marked in `dangling`.
+    """
+
+    def __init__(self, corpus):
+        self.pages = sorted(corpus)
+        self.size = len(self.pages)
+        index = {page: i for i, page in enumerate(self.pages)}
+
+        self.out_degree = numpy.fromiter((len(corpus[page]) for page in self.pages), dtype=numpy.int64,
+                                         count=self.size)
+        self.indptr = numpy.zeros(self.size + 1, dtype=numpy.int64)
+        numpy.cumsum(self.out_degree, out=self.indptr[1:])
+        links = itertools.chain.from_iterable(corpus[page] for page in self.pages)
+        self.indices = numpy.fromiter(map(index.__getitem__, links), dtype=numpy.int32, count=self.indptr[-1])
+        self.sources = numpy.repeat(numpy.arange(self.size, dtype=numpy.int32), self.out_degree)
+        self.dangling = self.out_degree == 0
+
+    def to_dict(self, values):
+        """Returns a dictionary of page names to the values of an array indexed by page"""
+        return dict(zip(self.pages, values.tolist()))
+
+
+def power_iteration(matrix, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Returns (ranks, iterations, change): the array of PageRank values, the number of
+    iterations run and the L1 distance between the last two iterations.
+
+    Each iteration computes
+        ranks' = (1 - d) / N + d * (links' share of ranks + dangling ranks / N)
+    where a page without links counts as linking to every page, including itself, as in
+    iterate_pagerank. That mass is spread as one number added to every page instead of
+    N * D entries in the matrix.
+    """
+    size = matrix.size
+    inverse_degree = numpy.zeros(size)
+    numpy.divide(1.0, matrix.out_degree, out=inverse_degree, where=~matrix.dangling)
+
+    ranks = numpy.full(size, 1 / size)
+    change = None
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        shares = (ranks * inverse_degree)[matrix.sources]
+        new_ranks = numpy.bincount(matrix.indices, weights=shares, minlength=size)
+        new_ranks += ranks[matrix.dangling].sum() / size
+        new_ranks *= damping_factor
+        new_ranks += (1 - damping_factor) / size
+
+        change = numpy.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iterations, change
+
+
+def walk(matrix, damping_factor, steps, walkers, seed=None, burn_in=BURN_IN):
+    """
+    Returns the array of visits to each page by `walkers` independent surfers
+    taking `steps` steps each from random pages, like sample_pagerank's one surfer,
+    after `burn_in` steps that are not counted.
+
+    A surfer follows a random link of its page with probability `damping_factor`,
+    and otherwise, or on a page without links, moves to a random page. Links are
+    unweighted, so a random link is a random entry of the page's row.
+    """
+    rng = numpy.random.default_rng(seed)
+    visits = numpy.zeros(matrix.size, dtype=numpy.int64)
+    positions = rng.integers(matrix.size, size=walkers)
+    recorded = numpy.empty((min(COUNT_EVERY, steps), walkers), dtype=numpy.int64)
+
+    for step in range(-burn_in, steps):
+        if step < 0:
+            positions = advance(matrix, damping_factor, positions, rng)
+            continue
+        recorded[step % COUNT_EVERY] = positions
+        if step % COUNT_EVERY == COUNT_EVERY - 1 or step == steps - 1:
+            visits += numpy.bincount(recorded[:step % COUNT_EVERY + 1].ravel(), minlength=matrix.size)
+        positions = advance(matrix, damping_factor, positions, rng)
+    return visits
+
+
+def advance(matrix, damping_factor, positions, rng):
+    """Returns the pages surfers on `positions` move to in one step"""
+    follow = (rng.random(len(positions)) < damping_factor) & ~matrix.dangling[positions]
+    following = positions[follow]
+    offsets = matrix.indptr[following] + (rng.random(len(following)) * matrix.out_degree[following]).astype(numpy.int64)
+    positions = rng.integers(matrix.size, size=len(positions))
+    positions[follow] = matrix.indices[offsets]
+    return positions
+
+
+def sample(matrix, damping_factor, samples, walkers=WALKERS, processes=1, seed=None):
+    """
+    Returns the array of PageRank values estimated from about `samples` visits,
+    made by `walkers` surfers split over `processes` processes. The same seed and
+    number of processes give the same values.
+    """
+    if samples < 1:
+        raise ValueError("samples must be at least 1")
+    if processes < 1:
+        raise ValueError("processes must be at least 1")
+    walkers = max(1, min(walkers, samples))
+    steps = math.ceil(samples / walkers)
+    seeds = numpy.random.SeedSequence(seed).spawn(processes)
+    shares = [walkers // processes + (k < walkers % processes) for k in range(processes)]
+
+    if processes == 1:
+        visits = walk(matrix, damping_factor, steps, walkers, seeds[0])
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            visits = sum(executor.map(walk, [matrix] * processes, [damping_factor] * processes,
+                                      [steps] * processes, shares, seeds))
+    return visits / visits.sum()
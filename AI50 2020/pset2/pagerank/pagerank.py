@@ -1,27 +1,59 @@
+import argparse
 import os
 import random
 import re
-import sys
 import bisect
 
+import matrix
+
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(description="Rank the pages of a corpus by sampling and by iteration")
+    parser.add_argument("corpus", help="directory of HTML pages")
+    parser.add_argument("--backend", choices=("dict", "matrix"), default="dict",
+                        help="sample and iterate over dictionaries page by page, or over a sparse link matrix")
+    parser.add_argument("--samples", type=positive_int, default=SAMPLES, help="pages visited by sampling")
+    parser.add_argument("--walkers", type=int, default=matrix.WALKERS,
+                        help="surfers the matrix backend advances together")
+    parser.add_argument("--processes", type=positive_int, default=1, help="processes the matrix backend samples on")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the sampling")
+    parser.add_argument("--tolerance", type=float, default=matrix.TOLERANCE,
+                        help="L1 change between iterations at which the matrix backend stops")
+    parser.add_argument("--max-iterations", type=int, default=matrix.MAX_ITERATIONS,
+                        help="iterations after which the matrix backend stops anyway")
+    args = parser.parse_args()
+
+    corpus = crawl(args.corpus)
+    if args.backend == "matrix":
+        ranks = sample_pagerank_walkers(corpus, DAMPING, args.samples, args.walkers, args.processes, args.seed)
+    else:
+        random.seed(args.seed)
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+    print(f"PageRank Results from Sampling (n = {args.samples})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    if args.backend == "matrix":
+        ranks = iterate_pagerank_matrix(corpus, DAMPING, args.tolerance, args.max_iterations)
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
 
+def positive_int(text):
+    """
+    Return the integer in `text`, for counts that must be at least 1.
+    """
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a number of at least 1, got {value}")
+    return value
+
+
 def crawl(directory):
     """
     Parse a directory of HTML pages and check for links to other pages.
@@ -153,5 +185,26 @@ def iterate_pagerank(corpus, damping_factor):
     return ranks
 
 
+def sample_pagerank_walkers(corpus, damping_factor, n, walkers=matrix.WALKERS, processes=1, seed=None):
+    """
+    Return PageRank values for each page from about `n` samples, like
+    sample_pagerank, but taken by many random surfers moving together on a
+    sparse link matrix, so memory grows with the links rather than N ** 2.
+    """
+    links = matrix.LinkMatrix(corpus)
+    return links.to_dict(matrix.sample(links, damping_factor, n, walkers, processes, seed))
+
+
+def iterate_pagerank_matrix(corpus, damping_factor, tolerance=matrix.TOLERANCE, max_iterations=matrix.MAX_ITERATIONS):
+    """
+    Return the same PageRank values as iterate_pagerank, computed by power
+    iteration on a sparse link matrix until the L1 change between iterations
+    falls below `tolerance` or `max_iterations` have run.
+    """
+    links = matrix.LinkMatrix(corpus)
+    ranks = matrix.power_iteration(links, damping_factor, tolerance, max_iterations)[0]
+    return links.to_dict(ranks)
+
+
 if __name__ == "__main__":
     main()